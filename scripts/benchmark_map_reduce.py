@@ -0,0 +1,60 @@
+"""
+Benchmark `map_reduce` against `group(...).get()` followed by a client-side reduce.
+
+Starts its own worker, so no other worker needs to be running:
+uv run python scripts/benchmark_map_reduce.py --numbers 40 --chunk-size 10 --concurrency 4
+"""
+
+import argparse
+
+from celery import group
+
+from celery_workshop.celery import app
+from celery_workshop.chapter1 import exercise4_double_number
+from celery_workshop.mapreduce import map_reduce
+from celery_workshop.testing import measure_execution_time, start_worker_in_process
+
+
+def run_group_then_reduce(numbers: list[int]) -> int:
+    """Baseline: every member result is stored and sent back to the client, which sums them."""
+    result = group(exercise4_double_number.s(number) for number in numbers).apply_async()
+    return sum(result.get(timeout=60))
+
+
+def main():
+    """Run both approaches on the same input and compare time and stored results."""
+    parser = argparse.ArgumentParser(description="Benchmark map_reduce against group + client-side reduce")
+    parser.add_argument("--numbers", type=int, default=40, help="Number of inputs to double and sum")
+    parser.add_argument("--chunk-size", type=int, default=10, help="Inputs per map_reduce chunk")
+    parser.add_argument("--concurrency", type=int, default=4, help="Worker concurrency")
+    args = parser.parse_args()
+
+    app.set_current()
+    numbers = list(range(args.numbers))
+    worker = start_worker_in_process(concurrency=args.concurrency)
+    next(worker)
+
+    try:
+        # Warm up the worker pool and database connections before measuring
+        run_group_then_reduce([0] * args.concurrency)
+
+        with measure_execution_time() as get_elapsed:
+            group_total = run_group_then_reduce(numbers)
+            group_time = get_elapsed()
+
+        with measure_execution_time() as get_elapsed:
+            map_reduce_total = map_reduce(
+                exercise4_double_number, numbers, "sum", chunk_size=args.chunk_size, timeout=60
+            )
+            map_reduce_time = get_elapsed()
+    finally:
+        worker.close()
+
+    chunks = -(-len(numbers) // args.chunk_size)
+    print(f"📊 {len(numbers)} inputs, concurrency={args.concurrency}, chunk_size={args.chunk_size}")
+    print(f"  group + client reduce: {group_time:6.2f}s  total={group_total}  stored results={len(numbers)}")
+    print(f"  map_reduce:            {map_reduce_time:6.2f}s  total={map_reduce_total}  stored results={chunks}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark result lookups under contention: clients polling SQLite directly against the result daemon.
+
+Every client process polls one task that is not done yet and reads finished results every
+`--interval` seconds (like `AsyncResult.get(interval=...)`), while a writer process stores new results
+the way workers do. No broker or worker is needed:
+uv run python scripts/benchmark_result_fanin.py --clients 1,4,16,64 --duration 3 --interval 0.01
+"""
+
+import argparse
+import multiprocessing
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.synchronize import Event
+from pathlib import Path
+from typing import cast
+
+from celery import Celery, states
+from celery.backends.base import Backend
+
+from celery_workshop.backends.fanin import FanInDatabaseBackend, ResultCache, ResultClient, ResultServer
+from celery_workshop.config import basic_celery_config
+from celery_workshop.loadgen import LatencyHistogram
+
+DATABASE_PATH = Path("./data/benchmark_fanin.sqlite")
+SOCKET_PATH = Path("./data/benchmark_fanin.sock")
+BACKENDS = {
+    "db+sqlite (stock)": f"db+sqlite:///{DATABASE_PATH}",
+    "fan-in daemon": f"celery_workshop.backends.fanin:FanInDatabaseBackend+sqlite:///{DATABASE_PATH}",
+}
+
+# Created in the parent process and inherited by the forked processes, like the backend of an app
+_backend: Backend | None = None
+
+
+def get_backend() -> Backend:
+    if _backend is None:
+        msg = "The backend is created by main() before forking"
+        raise RuntimeError(msg)
+    return _backend
+
+
+def poll_results(finished: list[str], duration: float, interval: float, seed: int) -> LatencyHistogram:
+    """One client: alternate between its own unfinished task and random finished ones (run in a forked child)."""
+    backend = get_backend()
+    rng = random.Random(seed)  # noqa: S311 (not used for security)
+    own_task = str(uuid.uuid4())
+    histogram = LatencyHistogram()
+    deadline = time.monotonic() + duration
+    while (started := time.monotonic()) < deadline:
+        task_id = own_task if histogram.total % 2 else rng.choice(finished)
+        backend.get_task_meta(task_id, cache=False)
+        histogram.record(time.monotonic() - started)
+        time.sleep(interval)
+    return histogram
+
+
+def write_results(stop: Event, rate: float) -> None:
+    """Store `rate` new results per second until stopped, like busy workers (run in a forked child)."""
+    backend = get_backend()
+    while not stop.wait(1 / rate):
+        backend.store_result(str(uuid.uuid4()), 42, states.SUCCESS)
+
+
+def serve_results() -> None:
+    """The result daemon (run in a forked child)."""
+    with ResultServer(cast(FanInDatabaseBackend, get_backend()), SOCKET_PATH, ResultCache()) as server:
+        server.serve_forever()
+
+
+def database_reads(client: ResultClient | None) -> int:
+    stats = client.stats() if client is not None else None
+    return 0 if stats is None else stats["reads"]
+
+
+def run_clients(clients: int, finished: list[str], duration: float, interval: float) -> LatencyHistogram:
+    """Poll with `clients` concurrent processes and merge their latencies."""
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=clients, mp_context=context) as executor:
+        futures = [executor.submit(poll_results, finished, duration, interval, seed) for seed in range(clients)]
+        histogram = LatencyHistogram()
+        for future in futures:
+            histogram.merge(future.result())
+    return histogram
+
+
+def main():
+    """Run the same polling load against each backend, for each number of concurrent clients."""
+    global _backend  # noqa: PLW0603
+
+    parser = argparse.ArgumentParser(description="Benchmark result lookups with many concurrent clients")
+    parser.add_argument("--clients", default="1,2,4,8,16,32,64", help="Comma-separated numbers of clients")
+    parser.add_argument("--duration", type=float, default=3, help="Seconds of polling per run")
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds each client waits between lookups")
+    parser.add_argument("--results", type=int, default=1000, help="Finished results to read")
+    parser.add_argument("--write-rate", type=float, default=100, help="New results stored per second meanwhile")
+    args = parser.parse_args()
+    client_counts = [int(count) for count in args.clients.split(",")]
+
+    DATABASE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    DATABASE_PATH.unlink(missing_ok=True)
+    context = multiprocessing.get_context("fork")
+    finished = [str(uuid.uuid4()) for _ in range(args.results)]
+
+    print(f"📊 Polling {len(finished)} finished results in {DATABASE_PATH}, {args.write_rate:.0f} writes/s meanwhile")
+    for name, url in BACKENDS.items():
+        app = Celery("benchmark", backend=url, set_as_current=False)
+        app.conf.update(basic_celery_config, result_fanin_socket=str(SOCKET_PATH))
+        _backend = app.backend
+        for task_id in finished:
+            _backend.store_result(task_id, 42, states.SUCCESS)
+
+        daemon, daemon_client = None, None
+        if name == "fan-in daemon":
+            daemon = context.Process(target=serve_results, daemon=True)
+            daemon.start()
+            while not SOCKET_PATH.exists():
+                time.sleep(0.01)
+            daemon_client = ResultClient(SOCKET_PATH)
+        stop = context.Event()
+        writer = context.Process(target=write_results, args=(stop, args.write_rate))
+        writer.start()
+        try:
+            print(f"  {name}")
+            for clients in client_counts:
+                reads_before = database_reads(daemon_client)
+                histogram = run_clients(clients, finished, args.duration, args.interval)
+                # Without the daemon, every lookup reads the database
+                reads = histogram.total if daemon_client is None else database_reads(daemon_client) - reads_before
+                print(
+                    f"    {clients:3d} clients  {histogram.total / args.duration:7.0f} lookups/s  "
+                    f"{reads / args.duration:7.0f} database reads/s  "
+                    f"p50 {histogram.percentile(50) * 1000:7.2f}ms  p99 {histogram.percentile(99) * 1000:7.2f}ms"
+                )
+        finally:
+            stop.set()
+            writer.join()
+            if daemon is not None:
+                daemon.terminate()
+                daemon.join()
+                SOCKET_PATH.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
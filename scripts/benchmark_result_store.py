@@ -0,0 +1,81 @@
+"""
+Benchmark the result-store overhead per task of the stock `db+` backend against `PooledDatabaseBackend`.
+
+Stores results the way a prefork worker child does: the backend is created in the parent process
+and used in a forked child. No broker or worker is needed:
+uv run python scripts/benchmark_result_store.py --tasks 500 --flush-interval 0.01
+"""
+
+import argparse
+import multiprocessing
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from celery import Celery, states
+from celery.backends.base import Backend
+
+from celery_workshop.config import basic_celery_config
+from celery_workshop.testing import measure_execution_time
+
+DATABASE_PATH = Path("./data/benchmark_results.sqlite")
+BACKENDS = {
+    "db+sqlite (stock)": f"db+sqlite:///{DATABASE_PATH}",
+    "pooled": f"celery_workshop.backends.database:PooledDatabaseBackend+sqlite:///{DATABASE_PATH}",
+}
+
+# Created in the parent process and inherited by the forked child, like a worker's backend
+_backend: Backend | None = None
+
+
+def store_results(tasks: int) -> tuple[float, float]:
+    """Store `tasks` results (run in a forked child). Returns the time spent storing and until all are written."""
+    if _backend is None:
+        msg = "The backend is created by main() before forking"
+        raise RuntimeError(msg)
+    # Warm up: the first store creates the engine of this process
+    _backend.store_result(str(uuid.uuid4()), 0, states.SUCCESS)
+    flush = getattr(_backend, "flush", lambda: None)
+    flush()
+
+    task_ids = [str(uuid.uuid4()) for _ in range(tasks)]
+    with measure_execution_time() as get_elapsed:
+        for number, task_id in enumerate(task_ids):
+            _backend.store_result(task_id, number, states.SUCCESS)
+        stored = get_elapsed()
+        flush()
+        written = get_elapsed()
+
+    if _backend.get_task_meta(task_ids[-1])["status"] != states.SUCCESS:
+        msg = "The last result was not stored"
+        raise RuntimeError(msg)
+    return stored, written
+
+
+def main():
+    """Store the same number of results with each backend and compare the cost per task."""
+    global _backend  # noqa: PLW0603
+
+    parser = argparse.ArgumentParser(description="Benchmark result-store overhead per task")
+    parser.add_argument("--tasks", type=int, default=500, help="Number of results to store")
+    parser.add_argument("--flush-interval", type=float, default=0.01, help="Write coalescing interval (pooled)")
+    args = parser.parse_args()
+
+    DATABASE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    print(f"📊 Storing {args.tasks} results per backend in {DATABASE_PATH}")
+    for name, url in BACKENDS.items():
+        app = Celery("benchmark", backend=url, set_as_current=False)
+        app.conf.update(basic_celery_config, pooled_result_flush_interval=args.flush_interval)
+        _backend = app.backend
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork")) as executor:
+            stored, written = executor.submit(store_results, args.tasks).result()
+
+        print(
+            f"  {name:<18} {stored / args.tasks * 1e6:8.0f}us per store call  "
+            f"{written / args.tasks * 1e6:8.0f}us per task until written  ({written:.2f}s total)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Generate sustained load with a mix of the chapter 1 tasks and report throughput and latency percentiles.
+
+Run this after starting workers for all queues of the mix, e.g.:
+uv run celery -A celery_workshop.celery worker --loglevel=warning -Q celery,compute,io
+
+Open-loop, 20 tasks/s for 30s after a 5s ramp-up:
+uv run python scripts/chapter1_loadgen.py --mix add=3,quick=1 --rate 20 --duration 30 --ramp-up 5
+
+Closed-loop, 8 concurrent clients, with the CPU tasks routed to the default queue:
+uv run python scripts/chapter1_loadgen.py --mix cpu,quick --concurrency 8 --route cpu=celery
+"""
+
+import argparse
+
+from celery_workshop.celery import app
+from celery_workshop.loadgen import WORKLOAD_TASKS, LoadConfig, LoadGenerator, parse_routes, parse_weights
+
+
+def main():
+    """Parse the load to generate, run it and print the report."""
+    parser = argparse.ArgumentParser(description="Generate load with a mix of the chapter 1 tasks")
+    parser.add_argument(
+        "--mix",
+        type=parse_weights,
+        default="add",
+        help=f"Weighted tasks, e.g. add=3,quick=1 (tasks: {', '.join(WORKLOAD_TASKS)})",
+    )
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--rate", type=float, help="Open-loop: submit this many tasks per second")
+    mode.add_argument("--concurrency", type=int, help="Closed-loop: number of clients waiting for their result")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of measured load after the ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=0, help="Seconds to ramp up to the full load, not measured")
+    parser.add_argument("--timeout", type=float, default=10, help="Seconds after which a task counts as timed out")
+    parser.add_argument("--route", type=parse_routes, default="", help="Queue overrides, e.g. cpu=celery,io=celery")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the task mix and arguments")
+    args = parser.parse_args()
+
+    app.set_current()
+    try:
+        config = LoadConfig(
+            mix=args.mix,
+            rate=args.rate,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            ramp_up=args.ramp_up,
+            timeout=args.timeout,
+            routes=args.route,
+            seed=args.seed,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    mode_description = f"{config.rate} tasks/s" if config.rate is not None else f"{config.concurrency} clients"
+    print(f"🚀 Generating load: {mode_description}, {config.ramp_up:g}s ramp-up, {config.duration:g}s measured")
+
+    report = LoadGenerator(config).run()
+
+    print(report.format())
+    print("✅ Load run completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,19 +6,31 @@ Usage:
     python scripts/manage_solutions.py remove    # Remove solutions (create student version)
     python scripts/manage_solutions.py restore   # Restore solutions from backup
     python scripts/manage_solutions.py check     # Check current status
+    python scripts/manage_solutions.py check --json
+
+A manifest (.solutions-manifest.json) records a content hash per file, so files that did not change
+since the last run are skipped. Files are processed in parallel.
 """
 
 import argparse
+import hashlib
+import json
 import re
 import shutil
+import sys
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Any
 
-# Files to process
+# Files to process (glob patterns relative to the workspace root)
 EXERCISE_FILES = [
-    "src/celery_workshop/chapter1_exercises.py",
-    # Add more files here as needed
+    "src/celery_workshop/chapter*_exercises.py",
+    # Add more files or patterns here as needed
 ]
 
+MANIFEST_FILE = ".solutions-manifest.json"
+
 # Solution boundary patterns
 START_PATTERN = re.compile(r"^\s*#\s*START\s+SOLUTION\s*$", re.IGNORECASE)
 END_PATTERN = re.compile(r"^\s*#\s*END\s+SOLUTION\s*$", re.IGNORECASE)
@@ -29,119 +41,210 @@ def get_workspace_root() -> Path:
     return Path(__file__).parent.parent
 
 
-def find_solution_blocks(content: str) -> list[tuple[int, int]]:
-    """Find all solution blocks in content."""
-    lines = content.splitlines()
-    blocks = []
-    current_start = None
-
-    for i, line in enumerate(lines):
-        if START_PATTERN.match(line):
-            current_start = i
-        elif END_PATTERN.match(line) and current_start is not None:
-            blocks.append((current_start, i))
-            current_start = None
+def get_backup_path(file_path: Path) -> Path:
+    """Get the path of the backup holding the solutions of a file."""
+    return file_path.with_suffix(f"{file_path.suffix}.backup")
+
+
+def hash_file(file_path: Path) -> str:
+    """Hash file content without loading it into memory at once."""
+    with file_path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def strip_solution_blocks(lines: Iterable[str], write: Callable[[str], Any]) -> int:
+    """Stream lines to `write`, replacing solution blocks by a placeholder. Returns the number of blocks."""
+    blocks = 0
+    # Lines of the currently open block, written unchanged if the block is never closed
+    block_lines: list[str] = []
+
+    for line in lines:
+        content = line.rstrip("\r\n")
+        if START_PATTERN.match(content):
+            for buffered in block_lines:
+                write(buffered)
+            block_lines = [line]
+        elif block_lines and END_PATTERN.match(content):
+            start_line = block_lines[0]
+            indent = " " * (len(start_line) - len(start_line.lstrip()))
+            newline = line[len(content) :]
+            placeholder_newline = newline or "\n"  # The END line may be the last line, without a newline
+            write(f"{indent}# TODO: Implement this function{placeholder_newline}{indent}pass{newline}")
+            block_lines = []
+            blocks += 1
+        elif block_lines:
+            block_lines.append(line)
+        else:
+            write(line)
 
+    for buffered in block_lines:
+        write(buffered)
     return blocks
 
 
-def remove_solutions(file_path: Path) -> None:
-    """Remove solutions from a file."""
-    try:
-        content = file_path.read_text(encoding="utf-8")
-        blocks = find_solution_blocks(content)
+def count_solution_blocks(file_path: Path) -> int:
+    """Count the solution blocks in a file."""
+    with file_path.open(encoding="utf-8", newline="") as f:
+        return strip_solution_blocks(f, lambda _: None)
 
-        if not blocks:
-            print(f"  No solutions found in {file_path.name}")
-            return
 
-        # Create backup
-        backup_path = file_path.with_suffix(f"{file_path.suffix}.backup")
-        shutil.copy2(file_path, backup_path)
+def remove_solutions(file_path: Path, entry: dict[str, Any]) -> tuple[str, dict[str, Any]]:
+    """Remove solutions from a file."""
+    current_hash = hash_file(file_path)
+    if current_hash == entry.get("stripped"):
+        return f"  {file_path.name}: unchanged, skipped", entry
 
-        lines = content.splitlines()
+    temp_path = file_path.with_suffix(f"{file_path.suffix}.tmp")
+    try:
+        with (
+            file_path.open(encoding="utf-8", newline="") as source,
+            temp_path.open("w", encoding="utf-8", newline="") as target,
+        ):
+            blocks = strip_solution_blocks(source, target.write)
 
-        # Process blocks in reverse order
-        for start_line, end_line in reversed(blocks):
-            indent = " " * (len(lines[start_line]) - len(lines[start_line].lstrip()))
-            placeholder = f"{indent}# TODO: Implement this function\n{indent}pass"
-            lines[start_line:end_line + 1] = [placeholder]
+        if not blocks:
+            return f"  No solutions found in {file_path.name}", entry
 
-        file_path.write_text("\n".join(lines), encoding="utf-8")
-        print(f"  Removed {len(blocks)} solution(s) from {file_path.name}")
+        # Create backup, unless it already holds this exact content
+        backup_path = get_backup_path(file_path)
+        if current_hash != entry.get("source") or not backup_path.exists():
+            shutil.copy2(file_path, backup_path)
 
-    except OSError as e:
-        print(f"  Error processing {file_path.name}: {e}")
+        temp_path.replace(file_path)
+    finally:
+        temp_path.unlink(missing_ok=True)  # Left over when there was nothing to replace or streaming failed
+    entry = {"source": current_hash, "stripped": hash_file(file_path), "solutions": blocks}
+    return f"  Removed {blocks} solution(s) from {file_path.name}", entry
 
 
-def restore_solutions(file_path: Path) -> None:
+def restore_solutions(file_path: Path, entry: dict[str, Any]) -> tuple[str, dict[str, Any]]:
     """Restore solutions from backup."""
-    backup_path = file_path.with_suffix(f"{file_path.suffix}.backup")
+    if hash_file(file_path) == entry.get("source"):
+        return f"  {file_path.name}: already restored, skipped", entry
 
+    backup_path = get_backup_path(file_path)
     if not backup_path.exists():
-        print(f"  No backup found for {file_path.name}")
-        return
+        return f"  No backup found for {file_path.name}", entry
 
-    try:
-        shutil.copy2(backup_path, file_path)
-        print(f"  Restored {file_path.name} from backup")
-    except OSError as e:
-        print(f"  Error restoring {file_path.name}: {e}")
+    shutil.copy2(backup_path, file_path)
+    return f"  Restored {file_path.name} from backup", entry
 
 
-def check_status(file_path: Path) -> None:
+def check_status(file_path: Path, entry: dict[str, Any]) -> tuple[str, dict[str, Any]]:
     """Check if file has solutions."""
+    current_hash = hash_file(file_path)
+    if current_hash == entry.get("stripped"):
+        solutions = 0
+    elif current_hash == entry.get("source"):
+        solutions = entry.get("solutions", 0)
+    else:
+        solutions = count_solution_blocks(file_path)
+
+    has_backup = get_backup_path(file_path).exists()
+    if solutions:
+        message = f"  {file_path.name}: has {solutions} solution(s)"
+    elif has_backup:
+        message = f"  {file_path.name}: no solutions (backup available)"
+    else:
+        message = f"  {file_path.name}: no solutions"
+    return message, {**entry, "check": {"solutions": solutions, "backup": has_backup}}
+
+
+ACTIONS = {
+    "remove": remove_solutions,
+    "restore": restore_solutions,
+    "check": check_status,
+}
+
+
+def process_file(action: str, file_path: Path, entry: dict[str, Any]) -> tuple[str, dict[str, Any]]:
+    """Run an action on a single file (in a worker process)."""
     try:
-        content = file_path.read_text(encoding="utf-8")
-        blocks = find_solution_blocks(content)
-        backup_path = file_path.with_suffix(f"{file_path.suffix}.backup")
-
-        if blocks:
-            print(f"  {file_path.name}: has {len(blocks)} solution(s)")
-        elif backup_path.exists():
-            print(f"  {file_path.name}: no solutions (backup available)")
-        else:
-            print(f"  {file_path.name}: no solutions")
+        return ACTIONS[action](file_path, entry)
+    except (OSError, UnicodeDecodeError) as e:
+        return f"  Error processing {file_path.name}: {e}", {**entry, "error": str(e)}
 
-    except OSError as e:
-        print(f"  {file_path.name}: error - {e}")
 
+def find_files(workspace: Path) -> list[Path]:
+    """Expand the patterns of EXERCISE_FILES into existing files."""
+    files: list[Path] = []
+    for file_pattern in EXERCISE_FILES:
+        matches = sorted(path for path in workspace.glob(file_pattern) if path.is_file())
+        if not matches:
+            print(f"  Skipping {file_pattern} (not found)", file=sys.stderr)  # Keeps stdout valid JSON
+        files.extend(match for match in matches if match not in files)
+    return files
 
-def process_files(action: str) -> None:
-    """Process all exercise files with given action."""
-    workspace = get_workspace_root()
 
-    print(f"Processing exercise files in {workspace}")
-    print("-" * 40)
+def load_manifest(workspace: Path) -> dict[str, dict[str, Any]]:
+    """Load the hashes recorded by previous runs."""
+    try:
+        return json.loads((workspace / MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
 
-    for file_pattern in EXERCISE_FILES:
-        file_path = workspace / file_pattern
-        if not file_path.exists():
-            print(f"  Skipping {file_pattern} (not found)")
-            continue
 
-        if action == "remove":
-            remove_solutions(file_path)
-        elif action == "restore":
-            restore_solutions(file_path)
-        elif action == "check":
-            check_status(file_path)
+def save_manifest(workspace: Path, manifest: dict[str, dict[str, Any]]) -> None:
+    """Store the hashes for the next run."""
+    (workspace / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def process_files(action: str, *, jobs: int | None = None, as_json: bool = False, force: bool = False) -> None:
+    """Process all exercise files with given action."""
+    workspace = get_workspace_root()
+    manifest = {} if force else load_manifest(workspace)
+
+    if not as_json:
+        print(f"Processing exercise files in {workspace}")
+        print("-" * 40)
+
+    files = find_files(workspace)
+    keys = [file_path.relative_to(workspace).as_posix() for file_path in files]
+    entries = [{k: v for k, v in manifest.get(key, {}).items() if k != "check"} for key in keys]
+    actions = [action] * len(files)
+
+    if jobs == 1 or len(files) <= 1:
+        outcomes = list(map(process_file, actions, files, entries))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            outcomes = list(executor.map(process_file, actions, files, entries))
+
+    summary: list[dict[str, Any]] = []
+    for key, (message, entry) in zip(keys, outcomes, strict=True):
+        check = entry.pop("check", None)
+        error = entry.pop("error", None)
+        if error is not None:
+            summary.append({"file": key, "error": error})
+        elif check is not None:
+            summary.append({"file": key, **check})
+        if not as_json:
+            print(message)
+        if entry:
+            manifest[key] = entry
+
+    if action != "check":
+        save_manifest(workspace, manifest)
+
+    if as_json:
+        total = sum(item.get("solutions", 0) for item in summary)
+        print(json.dumps({"files": summary, "total_solutions": total}, indent=2))
 
 
 def main() -> None:
     """Main entry point."""
     parser = argparse.ArgumentParser(
         description="Manage exercise solutions",
-        usage="python scripts/manage_solutions.py {remove|restore|check}"
-    )
-    parser.add_argument(
-        "action",
-        choices=["remove", "restore", "check"],
-        help="Action to perform"
+        usage="python scripts/manage_solutions.py {remove|restore|check} [--json] [--jobs N] [--force]",
     )
+    parser.add_argument("action", choices=list(ACTIONS), help="Action to perform")
+    parser.add_argument("--json", action="store_true", help="Print a JSON summary (check only)")
+    parser.add_argument("--jobs", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and process every file")
 
     args = parser.parse_args()
-    process_files(args.action)
+    if args.json and args.action != "check":
+        parser.error("--json is only supported for check")
+    process_files(args.action, jobs=args.jobs, as_json=args.json, force=args.force)
 
 
 if __name__ == "__main__":
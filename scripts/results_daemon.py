@@ -0,0 +1,43 @@
+"""
+Run the local result daemon of `FanInDatabaseBackend` (see celery_workshop/backends/fanin.py).
+
+Clients and workers using the fan-in backend find it on the Unix socket `result_fanin_socket`:
+uv run python scripts/results_daemon.py --database sqlite:///./data/backend.sqlite --max-entries 10000
+"""
+
+import argparse
+import contextlib
+import logging
+
+from celery import Celery
+
+from celery_workshop.backends.fanin import DEFAULT_MAX_ENTRIES, DEFAULT_PENDING_TTL, DEFAULT_SOCKET, serve
+from celery_workshop.config import basic_celery_config
+
+
+def main():
+    """Serve the results of the given database until interrupted."""
+    parser = argparse.ArgumentParser(description="Serve task results to local clients from memory")
+    parser.add_argument("--database", default="sqlite:///./data/backend.sqlite", help="SQLAlchemy URL of the results")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket to listen on")
+    parser.add_argument("--max-entries", type=int, default=DEFAULT_MAX_ENTRIES, help="Finished results kept in memory")
+    parser.add_argument(
+        "--pending-ttl", type=float, default=DEFAULT_PENDING_TTL, help="Seconds an unfinished state is shared"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    app = Celery("results_daemon", backend=f"celery_workshop.backends.fanin:FanInDatabaseBackend+{args.database}")
+    app.conf.update(
+        basic_celery_config,
+        result_fanin_socket=args.socket,
+        result_fanin_max_entries=args.max_entries,
+        result_fanin_pending_ttl=args.pending_ttl,
+    )
+    print(f"📡 Serving results of {args.database} on {args.socket} (Ctrl+C to stop)")
+    with contextlib.suppress(KeyboardInterrupt):
+        serve(app)
+
+
+if __name__ == "__main__":
+    main()
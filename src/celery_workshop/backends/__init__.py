@@ -0,0 +1 @@
+"""Result backends for the workshop setup."""
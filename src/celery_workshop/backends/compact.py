@@ -0,0 +1,447 @@
+"""
+Compact SQLite result backend.
+
+The `db+sqlite` backend stores every result as a pickled blob, so questions like "all results of
+this group" or "all failed tasks in the last hour" end up as full table scans. This backend keeps
+one narrow row per task: small scalar results (None, bool, int, float, str) are stored inline as
+native SQLite values, anything else is serialized. Status, date_done, group_id and parent_id are
+indexed, and results can be read and written in bulk.
+
+Writes are coalesced: a stored result waits up to `compact_result_flush_interval` seconds, so a
+worker that finishes many tasks writes their results in one transaction. Reads and forgets in the
+same process flush first, and so does a worker process that shuts down.
+
+Enable it with:
+
+    app = Celery(..., backend="celery_workshop.backends.compact:CompactBackend+sqlite:///./data/results.sqlite")
+"""
+
+import atexit
+import logging
+import math
+import os
+import threading
+import time
+from collections.abc import Callable, Generator, Iterable, MutableMapping, Sequence
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, cast
+
+from celery import Celery, signals, states
+from celery.app.task import Context
+from celery.backends.base import BaseBackend
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from celery.result import GroupResult, result_from_tuple
+from celery.utils.time import maybe_timedelta
+
+from celery_workshop.sqlite import SQLiteStore, immediate_transaction
+
+logger = logging.getLogger(__name__)
+
+SQLITE_URL_PREFIX = "sqlite:///"
+DEFAULT_URL = f"{SQLITE_URL_PREFIX}./data/results.sqlite"
+
+# How a result value is kept in the `result` column
+INLINE = 0  # None, int, float or str stored as the native SQLite value
+BOOLEAN = 1  # Stored as 0/1
+SERIALIZED = 2  # Encoded with the result serializer
+
+INT64_MIN, INT64_MAX = -(2**63), 2**63 - 1
+MAX_QUERY_PARAMS = 500  # Stay well below SQLite's limit of host parameters per statement
+DEFAULT_FLUSH_INTERVAL = 0.01  # seconds
+DEFAULT_MAX_BATCH = 100
+
+TASK_COLUMNS = "task_id, status, date_done, group_id, parent_id, result, result_encoding, traceback, children"
+
+type Row = tuple[Any, ...]
+
+
+def _fits_inline(value: object) -> bool:
+    """Whether a value can be stored as a native SQLite value and read back unchanged."""
+    if value is None or isinstance(value, str):
+        return True
+    if isinstance(value, int):
+        return INT64_MIN <= value <= INT64_MAX
+    return isinstance(value, float) and math.isfinite(value)
+
+
+class CompactResultStore(SQLiteStore):
+    """The SQLite tables behind `CompactBackend`."""
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS task_results (
+        task_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        date_done REAL,
+        group_id TEXT,
+        parent_id TEXT,
+        result BLOB,
+        result_encoding INTEGER NOT NULL DEFAULT 0,
+        traceback TEXT,
+        children TEXT
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS ix_task_results_status_date_done ON task_results (status, date_done);
+    CREATE INDEX IF NOT EXISTS ix_task_results_date_done ON task_results (date_done);
+    CREATE INDEX IF NOT EXISTS ix_task_results_group_id ON task_results (group_id) WHERE group_id IS NOT NULL;
+    CREATE INDEX IF NOT EXISTS ix_task_results_parent_id ON task_results (parent_id) WHERE parent_id IS NOT NULL;
+
+    CREATE TABLE IF NOT EXISTS group_results (
+        group_id TEXT PRIMARY KEY,
+        result TEXT NOT NULL,
+        date_done REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS ix_group_results_date_done ON group_results (date_done);
+    """
+
+    def write_tasks(self, rows: Iterable[Row]) -> None:
+        """Insert or replace task rows (ordered like TASK_COLUMNS) in a single transaction."""
+        with self._lock, immediate_transaction(self._connect()) as connection:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO task_results ({TASK_COLUMNS}) VALUES ({', '.join('?' * 9)})",  # noqa: S608
+                rows,
+            )
+
+    def read_tasks(self, task_ids: Sequence[str]) -> list[Row]:
+        rows: list[Row] = []
+        with self._lock:
+            connection = self._connect()
+            for offset in range(0, len(task_ids), MAX_QUERY_PARAMS):
+                chunk = task_ids[offset : offset + MAX_QUERY_PARAMS]
+                placeholders = ", ".join("?" * len(chunk))
+                rows.extend(
+                    connection.execute(
+                        f"SELECT {TASK_COLUMNS} FROM task_results WHERE task_id IN ({placeholders})",  # noqa: S608
+                        chunk,
+                    ).fetchall()
+                )
+        return rows
+
+    def query_tasks(self, where: Sequence[str], params: Sequence[Any], limit: int | None = None) -> list[Row]:
+        sql = f"SELECT {TASK_COLUMNS} FROM task_results"  # noqa: S608 (conditions are built from placeholders)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY date_done"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def delete_task(self, task_id: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM task_results WHERE task_id = ?", (task_id,))
+
+    def write_group(self, group_id: str, result: str | bytes, date_done: float) -> None:
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO group_results (group_id, result, date_done) VALUES (?, ?, ?)",
+                (group_id, result, date_done),
+            )
+
+    def read_group(self, group_id: str) -> Row | None:
+        with self._lock:
+            return (
+                self._connect()
+                .execute("SELECT result, date_done FROM group_results WHERE group_id = ?", (group_id,))
+                .fetchone()
+            )
+
+    def delete_group(self, group_id: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM group_results WHERE group_id = ?", (group_id,))
+
+    def delete_older_than(self, date_done: float) -> None:
+        with self._lock, immediate_transaction(self._connect()) as connection:
+            connection.execute("DELETE FROM task_results WHERE date_done < ?", (date_done,))
+            connection.execute("DELETE FROM group_results WHERE date_done < ?", (date_done,))
+
+
+class CompactBackend(BaseBackend):
+    """Result backend keeping typed, indexed results in a local SQLite file."""
+
+    # Attributes set by the base class, declared for type checking
+    app: Celery
+    expires: timedelta | None
+    max_sleep_between_retries_ms: int
+    _cache: MutableMapping[str, dict[str, Any]]
+
+    supports_native_join = True
+    # ResultSet.iterate should sleep this much between each poll, like the database backend
+    subpolling_interval = 0.5
+
+    def __init__(self, url: str | None = None, **kwargs: Any) -> None:
+        super().__init__(expires_type=maybe_timedelta, url=url, **kwargs)
+        self.url = url or DEFAULT_URL
+        if not self.url.startswith(SQLITE_URL_PREFIX):
+            msg = f"CompactBackend needs a {SQLITE_URL_PREFIX}<path> url, got {self.url!r}"
+            raise ValueError(msg)
+        self.store = CompactResultStore(Path(self.url.removeprefix(SQLITE_URL_PREFIX)))
+
+        conf = self.app.conf
+        self.flush_interval = float(conf.get("compact_result_flush_interval", DEFAULT_FLUSH_INTERVAL))
+        self.max_batch = int(conf.get("compact_result_max_batch", DEFAULT_MAX_BATCH))
+        self._pid: int | None = None
+        self._reset_pending()
+
+        # Celery tells bound methods apart by their function only, so every instance needs its own uid
+        uid = f"{type(self).__name__}-{id(self)}"
+        signals.worker_process_shutdown.connect(self._on_shutdown, weak=False, dispatch_uid=uid)
+        signals.worker_shutdown.connect(self._on_shutdown, weak=False, dispatch_uid=uid)
+        atexit.register(self.flush)
+
+    # -- Encoding --------------------------------------------------------------------------------
+
+    def _encode_value(self, value: object) -> tuple[object, int]:
+        if isinstance(value, bool):
+            return int(value), BOOLEAN
+        if _fits_inline(value):
+            return value, INLINE
+        return self.encode(value), SERIALIZED
+
+    def _decode_value(self, value: object, encoding: int) -> object:
+        if encoding == BOOLEAN:
+            return bool(value)
+        if encoding == SERIALIZED:
+            return self.decode(cast(bytes, value))
+        return value
+
+    def _row_for(self, task_id: str, result: object, state: str, traceback: str | None, request: Context | None) -> Row:
+        value, encoding = self._encode_value(result)
+        children = self.current_task_children(request)
+        return (
+            task_id,
+            state,
+            time.time() if state in states.READY_STATES else None,
+            getattr(request, "group", None),
+            getattr(request, "parent_id", None),
+            value,
+            encoding,
+            traceback,
+            self.encode(children) if children else None,
+        )
+
+    def _meta_from_row(self, row: Row) -> dict[str, Any]:
+        task_id, status, date_done, group_id, parent_id, value, encoding, traceback, children = row
+        return self.meta_from_decoded({
+            "task_id": task_id,
+            "status": status,
+            "result": self._decode_value(value, encoding),
+            "traceback": traceback,
+            "children": self.decode(children) if children else [],
+            "date_done": datetime.fromtimestamp(date_done, UTC) if date_done is not None else None,
+            "group_id": group_id,
+            "parent_id": parent_id,
+        })
+
+    # -- Coalesced writes ------------------------------------------------------------------------
+
+    def _reset_pending(self) -> None:
+        """Start with no pending rows in a new process. Rows of the parent process are flushed by the parent."""
+        self._pending: dict[str, Row] = {}  # Rows waiting for the next flush, by task id
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Held while a batch is written, so readers see it afterwards
+        self._has_pending = threading.Event()
+        self._flusher_pid: int | None = None
+        self._pid = os.getpid()
+
+    def _on_shutdown(self, **_kwargs: Any) -> None:
+        self.flush()
+
+    def _flush_loop(self) -> None:
+        pid = os.getpid()
+        failures = 0
+        while self._pid == pid:
+            self._has_pending.wait()
+            # Let more results join the batch, and back off while the database keeps failing
+            time.sleep(min(self.flush_interval * 2**failures, self.max_sleep_between_retries_ms / 1000))
+            try:
+                self.flush()
+            except Exception:
+                failures += 1
+                logger.exception(f"Failed to write results ({failures} time(s) in a row), will retry")
+            else:
+                failures = 0
+
+    def flush(self) -> None:
+        """
+        Write all pending results of this process in one transaction.
+
+        If the write fails, the results are kept for the next flush and the error is raised.
+        """
+        if self._pid != os.getpid():
+            return
+        with self._flush_lock:
+            with self._pending_lock:
+                rows = list(self._pending.values())
+                self._pending.clear()
+                self._has_pending.clear()
+            if not rows:
+                return
+            try:
+                self.store.write_tasks(rows)
+            except Exception:
+                with self._pending_lock:
+                    for row in rows:
+                        self._pending.setdefault(row[0], row)  # A state stored meanwhile is newer
+                    self._has_pending.set()
+                raise
+
+    # -- Backend interface -----------------------------------------------------------------------
+
+    def _store_result(
+        self,
+        task_id: str,
+        result: object,
+        state: str,
+        traceback: str | None = None,
+        request: Context | None = None,
+        **_kwargs: Any,
+    ) -> None:
+        row = self._row_for(task_id, result, state, traceback, request)
+        if self._pid != os.getpid():
+            self._reset_pending()
+        with self._pending_lock:
+            self._pending[task_id] = row  # A later state of the same task replaces the earlier one
+            batch_full = len(self._pending) >= self.max_batch
+            self._has_pending.set()
+            if self.flush_interval > 0 and self._flusher_pid != self._pid:
+                threading.Thread(target=self._flush_loop, name="result-flusher", daemon=True).start()
+                self._flusher_pid = self._pid
+        if batch_full or self.flush_interval <= 0:
+            self.flush()
+
+    def _get_task_meta_for(self, task_id: str) -> dict[str, Any]:
+        self.flush()
+        rows = self.store.read_tasks([task_id])
+        if not rows:
+            return {"status": states.PENDING, "result": None}
+        return self._meta_from_row(rows[0])
+
+    def _forget(self, task_id: str) -> None:
+        with self._pending_lock:
+            self._pending.pop(task_id, None)
+        self.flush()
+        self.store.delete_task(task_id)
+
+    def _save_group(self, group_id: str, result: GroupResult) -> GroupResult:
+        self.store.write_group(group_id, self.encode(result.as_tuple()), time.time())
+        return result
+
+    def _restore_group(self, group_id: str) -> dict[str, Any] | None:
+        row = self.store.read_group(group_id)
+        if row is None:
+            return None
+        return {
+            "result": result_from_tuple(self.decode(row[0]), self.app),
+            "date_done": datetime.fromtimestamp(row[1], UTC),
+        }
+
+    def _delete_group(self, group_id: str) -> None:
+        self.store.delete_group(group_id)
+
+    def cleanup(self) -> None:
+        """Delete expired results, using the date_done index."""
+        if self.expires:
+            self.flush()
+            self.store.delete_older_than(time.time() - self.expires.total_seconds())
+
+    # -- Bulk API --------------------------------------------------------------------------------
+
+    def store_many(self, results: Iterable[tuple[str, object, str]], request: Context | None = None) -> None:
+        """
+        Store `(task_id, result, state)` triples in a single transaction, right away.
+
+        For callers storing results themselves (imports, backfills). Workers batch through `flush`.
+        """
+        self.flush()  # Pending states of the same tasks are older
+        self.store.write_tasks(
+            self._row_for(task_id, self.encode_result(result, state), state, None, request)
+            for task_id, result, state in results
+        )
+
+    def get_many_meta(self, task_ids: Iterable[str]) -> dict[str, dict[str, Any]]:
+        """Get the meta of all known tasks among `task_ids` with as few queries as possible."""
+        self.flush()
+        return {row[0]: self._meta_from_row(row) for row in self.store.read_tasks(list(task_ids))}
+
+    def query(
+        self,
+        *,
+        status: str | Iterable[str] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        group_id: str | None = None,
+        parent_id: str | None = None,
+        limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Find task results by status, completion date, group or parent, oldest first.
+
+        For example all failures of the last hour:
+            backend.query(status=states.FAILURE, since=app.now() - timedelta(hours=1))
+        """
+        where: list[str] = []
+        params: list[Any] = []
+        if status is not None:
+            statuses = [status] if isinstance(status, str) else list(status)
+            where.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if since is not None:
+            where.append("date_done >= ?")
+            params.append(since.timestamp())
+        if until is not None:
+            where.append("date_done < ?")
+            params.append(until.timestamp())
+        if group_id is not None:
+            where.append("group_id = ?")
+            params.append(group_id)
+        if parent_id is not None:
+            where.append("parent_id = ?")
+            params.append(parent_id)
+        self.flush()
+        return [self._meta_from_row(row) for row in self.store.query_tasks(where, params, limit)]
+
+    def get_many(
+        self,
+        task_ids: Iterable[str],
+        *,
+        timeout: float | None = None,
+        interval: float = 0.5,
+        no_ack: bool = True,
+        on_message: Callable[[dict[str, Any]], None] | None = None,
+        on_interval: Callable[[], None] | None = None,
+        max_iterations: int | None = None,
+    ) -> Generator[tuple[str, dict[str, Any]]]:
+        """Yield `(task_id, meta)` for tasks as they become ready, polling them all with one query per interval."""
+        _ = no_ack  # Unused
+        pending = set(task_ids)
+        for task_id in list(pending):
+            cached = self._cache.get(task_id)
+            if cached is not None and cached["status"] in states.READY_STATES:
+                pending.discard(task_id)
+                yield task_id, cached
+
+        iterations = 0
+        while pending:
+            ready = {
+                task_id: meta
+                for task_id, meta in self.get_many_meta(pending).items()
+                if meta["status"] in states.READY_STATES
+            }
+            self._cache.update(ready)
+            pending.difference_update(ready)
+            for task_id, meta in ready.items():
+                if on_message is not None:
+                    on_message(meta)
+                yield task_id, meta
+
+            if not pending:
+                break
+            if timeout and iterations * interval >= timeout:
+                msg = f"Operation timed out ({timeout})"
+                raise CeleryTimeoutError(msg)
+            if on_interval:
+                on_interval()
+            time.sleep(interval)
+            iterations += 1
+            if max_iterations and iterations >= max_iterations:
+                break
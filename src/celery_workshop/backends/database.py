@@ -0,0 +1,253 @@
+"""
+SQLAlchemy result backend with a pooled engine per process and coalesced writes.
+
+The stock `db+` backend opens an ORM session for every stored result, and creates a new engine
+(without pooling) in every process that was not forked from a worker. This backend keeps one
+pooled engine per process, created on `worker_process_init` in prefork children (and lazily
+anywhere else, or again after a fork). Results are written with a single prebuilt upsert
+statement, so the compiled statement is cached by SQLAlchemy and the prepared statement by the
+pooled DBAPI connection.
+
+Writes are coalesced: a stored result waits up to `pooled_result_flush_interval` seconds, so the
+results of several tasks (and several states of the same task) go to the database in one short
+transaction. Reads and forgets in the same process flush first. Failed writes are retried with
+backoff, and their results wait for the next flush. Results still waiting when a process is killed
+(not shut down) are lost, so keep the interval short.
+
+Enable it with:
+
+    app = Celery(..., backend="celery_workshop.backends.database:PooledDatabaseBackend+sqlite:///./data/backend.sqlite")
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, cast
+
+from celery import Celery, signals, states
+from celery.app.task import Context
+from celery.backends.database import DatabaseBackend
+from celery.backends.database.session import SessionManager
+from celery.utils.time import get_exponential_backoff_interval
+from sqlalchemy import Engine, create_engine, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, sessionmaker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 0.01  # seconds
+DEFAULT_MAX_BATCH = 100
+MAX_WRITE_RETRIES = 3  # Attempts per write, like the `retry` decorator of `DatabaseBackend`
+POOL_SIZE = 2  # The task thread and the flush thread
+
+
+class PooledDatabaseBackend(DatabaseBackend):
+    """`DatabaseBackend` reusing a pooled engine per process and batching result writes."""
+
+    app: Celery
+    url: str
+    engine_options: dict[str, Any]
+    session_manager: SessionManager
+    base_sleep_between_retries_ms: int
+    max_sleep_between_retries_ms: int
+
+    def __init__(
+        self,
+        dburi: str | None = None,
+        engine_options: dict[str, Any] | None = None,
+        url: str | None = None,
+        **kwargs: Any,
+    ) -> None:
+        # State of the current process, set before the base class uses it to create the tables
+        self._pid: int | None = None
+        self._engine: Engine | None = None
+        self._sessions: sessionmaker[Session] | None = None
+        self._upsert: Callable[[Any, list[dict[str, Any]]], None] | None = None
+        self._flusher_pid: int | None = None
+        self._pending: dict[str, dict[str, Any]] = {}  # Rows waiting for the next flush, by task id
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Held while a batch is written, so readers see it afterwards
+        self._has_pending = threading.Event()
+
+        super().__init__(dburi=dburi, engine_options=engine_options, url=url, **kwargs)
+        conf = self.app.conf
+        self.flush_interval = float(conf.get("pooled_result_flush_interval", DEFAULT_FLUSH_INTERVAL))
+        self.max_batch = int(conf.get("pooled_result_max_batch", DEFAULT_MAX_BATCH))
+
+        table = self.task_cls.__table__
+        self._columns = [column.name for column in table.columns if column.name != "id"]
+        self._select = select(*(table.c[name] for name in self._columns))
+
+        uid = f"{type(self).__name__}-{id(self)}"  # One receiver per instance, see backends/compact.py
+        signals.worker_process_init.connect(self._on_worker_process_init, weak=False, dispatch_uid=uid)
+        signals.worker_process_shutdown.connect(self._on_shutdown, weak=False, dispatch_uid=uid)
+        signals.worker_shutdown.connect(self._on_shutdown, weak=False, dispatch_uid=uid)
+        atexit.register(self.flush)
+
+    # -- Engine per process ----------------------------------------------------------------------
+
+    def _on_worker_process_init(self, **_kwargs: Any) -> None:
+        self._get_engine()
+
+    def _on_shutdown(self, **_kwargs: Any) -> None:
+        self.flush()
+
+    def _get_engine(self) -> Engine:
+        if self._engine is None or self._pid != os.getpid():
+            options = dict(self.engine_options, pool_size=POOL_SIZE, max_overflow=0)
+            if self.url.startswith("sqlite"):
+                options.pop("pool_pre_ping", None)  # A round-trip per checkout, pointless for a local file
+            engine = create_engine(self.url, **options)
+            self.session_manager.prepare_models(engine)
+
+            self._engine = engine
+            self._sessions = sessionmaker(bind=engine)
+            self._upsert = None
+            self._pending = {}  # Rows of the parent process are flushed by the parent
+            self._pending_lock = threading.Lock()
+            self._flush_lock = threading.Lock()
+            self._has_pending = threading.Event()
+            self._pid = os.getpid()
+        return self._engine
+
+    def _build_upsert(self, engine: Engine) -> Callable[[Any, list[dict[str, Any]]], None]:
+        table = self.task_cls.__table__
+        dialects = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+        if (insert := dialects.get(engine.dialect.name)) is not None:
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.task_id],
+                set_={name: statement.excluded[name] for name in self._columns if name != "task_id"},
+            )
+            return lambda connection, rows: connection.execute(statement, rows)
+
+        # Without an upsert: update the existing rows, insert the others
+        def update_or_insert(connection: Any, rows: list[dict[str, Any]]) -> None:  # noqa: ANN401
+            for row in rows:
+                result = connection.execute(update(table).where(table.c.task_id == row["task_id"]).values(row))
+                if not result.rowcount:
+                    connection.execute(table.insert().values(row))
+
+        return update_or_insert
+
+    def ResultSession(self, session_manager: Any | None = None) -> Session:  # noqa: N802, ANN401
+        """Sessions for the inherited group, forget and cleanup queries, on the pooled engine of this process."""
+        _ = session_manager  # Unused
+        self._get_engine()
+        return cast(sessionmaker[Session], self._sessions)()
+
+    # -- Coalesced writes ------------------------------------------------------------------------
+
+    def _flush_loop(self) -> None:
+        pid = os.getpid()
+        failures = 0
+        while self._pid == pid:
+            self._has_pending.wait()
+            # Let more results join the batch, and back off while the database keeps failing
+            time.sleep(min(self.flush_interval * 2**failures, self.max_sleep_between_retries_ms / 1000))
+            try:
+                self.flush()
+            except Exception:
+                failures += 1
+                logger.exception(f"Failed to write results ({failures} time(s) in a row), will retry")
+            else:
+                failures = 0
+
+    def flush(self) -> None:
+        """
+        Write all pending results of this process in one transaction.
+
+        If the write fails, the results are kept for the next flush and the error is raised.
+        """
+        if self._pid != os.getpid():
+            return
+        with self._flush_lock:
+            with self._pending_lock:
+                rows = list(self._pending.values())
+                self._pending.clear()
+                self._has_pending.clear()
+            if not rows:
+                return
+            try:
+                self._write(rows)
+            except Exception:
+                with self._pending_lock:
+                    for row in rows:
+                        self._pending.setdefault(row["task_id"], row)  # A state stored meanwhile is newer
+                    self._has_pending.set()
+                raise
+
+    def _write(self, rows: list[dict[str, Any]]) -> None:
+        """Upsert rows, retrying errors that are safe to retry with exponential backoff (like `DatabaseBackend`)."""
+        for retries in range(MAX_WRITE_RETRIES):
+            try:
+                engine = self._get_engine()
+                if self._upsert is None:
+                    self._upsert = self._build_upsert(engine)
+                with engine.begin() as connection:
+                    self._upsert(connection, rows)
+            except Exception as exc:
+                if not self.exception_safe_to_retry(exc) or retries + 1 >= MAX_WRITE_RETRIES:
+                    raise
+                logger.warning(f"Failed to write {len(rows)} result(s), retrying: {exc}")
+                backoff_ms = get_exponential_backoff_interval(
+                    self.base_sleep_between_retries_ms, retries, self.max_sleep_between_retries_ms, full_jitter=True
+                )
+                time.sleep(backoff_ms / 1000)
+            else:
+                return
+
+    def _store_result(
+        self,
+        task_id: str,
+        result: object,
+        state: str,
+        traceback: str | None = None,
+        request: Context | None = None,
+        **_kwargs: Any,
+    ) -> None:
+        self._get_engine()
+        get_result_meta: Callable[..., object] = self._get_result_meta  # pyright: ignore[reportAttributeAccessIssue, reportUnknownMemberType, reportUnknownVariableType]
+        meta = cast(
+            dict[str, Any],
+            get_result_meta(
+                result=result, state=state, traceback=traceback, request=request, format_date=False, encode=True
+            ),
+        )
+        row = {name: meta.get(name) for name in self._columns}
+        row["task_id"] = task_id
+
+        with self._pending_lock:
+            self._pending[task_id] = row  # A later state of the same task replaces the earlier one
+            batch_full = len(self._pending) >= self.max_batch
+            self._has_pending.set()
+            if self.flush_interval > 0 and self._flusher_pid != self._pid:
+                threading.Thread(target=self._flush_loop, name="result-flusher", daemon=True).start()
+                self._flusher_pid = self._pid
+        if batch_full or self.flush_interval <= 0:
+            self.flush()
+
+    # -- Reads and deletes -----------------------------------------------------------------------
+
+    def _get_task_meta_for(self, task_id: str) -> dict[str, Any]:
+        self.flush()
+        table = self.task_cls.__table__
+        with self._get_engine().connect() as connection:
+            row = connection.execute(self._select.where(table.c.task_id == task_id)).mappings().first()
+        if row is None:
+            return {"status": states.PENDING, "result": None}
+
+        data = dict(row)
+        for field in ("args", "kwargs"):
+            if data.get(field) is not None:
+                data[field] = self.decode(data[field])
+        return self.meta_from_decoded(data)
+
+    def _forget(self, task_id: str) -> None:
+        with self._pending_lock:
+            self._pending.pop(task_id, None)
+        self.flush()
+        super()._forget(task_id)  # pyright: ignore[reportAttributeAccessIssue, reportUnknownMemberType]
@@ -0,0 +1,296 @@
+"""
+SQLAlchemy result backend served from a local result daemon.
+
+With the `db+` backend, every process waiting for results polls the database on its own, so the
+load on a shared SQLite file grows with the number of clients. `FanInDatabaseBackend` writes results
+like the `db+` backend, and additionally:
+
+- Workers push every finished result to the daemon right after it is committed.
+- Clients look results up in the daemon over a Unix socket, so `AsyncResult.get()` is answered from
+  memory once the task is done. The daemon reads unknown tasks from the database for all clients, one
+  read at a time, and shares the answer for tasks that are not done yet for `result_fanin_pending_ttl`.
+
+The daemon keeps the most recent `result_fanin_max_entries` finished results (least recently used
+are dropped first). It is optional: while it is not running, the backend reads the database directly.
+Start it with:
+
+    uv run python scripts/results_daemon.py
+
+and enable the backend with:
+
+    app = Celery(..., backend="celery_workshop.backends.fanin:FanInDatabaseBackend+sqlite:///./data/backend.sqlite")
+
+The rows are written by the `db+` backend code, so processes still configured with `db+` read the
+same results, only without the daemon.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, cast
+
+from celery import Celery, states
+from celery.app.task import Context
+from celery.backends.database import DatabaseBackend
+from celery.exceptions import ImproperlyConfigured
+from sqlalchemy.orm import object_session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "./data/results.sock"
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_PENDING_TTL = 0.25  # seconds
+SOCKET_TIMEOUT = 5  # seconds
+RECONNECT_INTERVAL = 1  # seconds without trying the daemon again after it could not be reached
+
+
+class ResultCache:
+    """Bounded LRU of encoded results. Results of tasks that are not done yet expire after `pending_ttl`."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, pending_ttl: float = DEFAULT_PENDING_TTL) -> None:
+        self.max_entries = max_entries
+        self.pending_ttl = pending_ttl
+        self._entries: OrderedDict[str, tuple[str, float | None]] = OrderedDict()  # task id -> payload, expiry
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, task_id: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(task_id)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                self._entries.move_to_end(task_id)
+                return entry[0]
+            return None
+
+    def put(self, task_id: str, payload: str, *, ready: bool) -> None:
+        expires = None if ready else time.monotonic() + self.pending_ttl
+        with self._lock:
+            current = self._entries.get(task_id)
+            if not ready and current is not None and current[1] is None:
+                return  # A finished result pushed while the database was read
+            self._entries[task_id] = (payload, expires)
+            self._entries.move_to_end(task_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, task_id: str) -> None:
+        with self._lock:
+            self._entries.pop(task_id, None)
+
+
+class _ResultRequestHandler(socketserver.StreamRequestHandler):
+    """One client connection: JSON requests, one per line. Only `get` and `stats` are answered."""
+
+    def handle(self) -> None:
+        server = cast(ResultServer, self.server)
+        for line in self.rfile:
+            request = json.loads(line)
+            match request["op"]:
+                case "get":
+                    response: dict[str, Any] = {"payload": server.lookup(request["task_id"])}
+                case "put":
+                    server.cache.put(request["task_id"], request["payload"], ready=True)
+                    continue
+                case "forget":
+                    server.cache.discard(request["task_id"])
+                    continue
+                case "stats":
+                    response = server.stats()
+                case op:
+                    response = {"error": f"Unknown operation {op!r}"}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class ResultServer(socketserver.ThreadingUnixStreamServer):
+    """The result daemon: serves results of `backend` from a `ResultCache`, reading misses from the database."""
+
+    daemon_threads = True
+
+    def __init__(self, backend: "FanInDatabaseBackend", path: Path | str, cache: ResultCache | None = None) -> None:
+        self.backend = backend
+        self.cache = cache or ResultCache()
+        self.hits = 0
+        self.reads = 0  # Lookups answered from the database
+        self._read_lock = threading.Lock()  # One database reader for all clients
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.unlink(missing_ok=True)  # Left behind by a daemon that was killed
+        super().__init__(str(path), _ResultRequestHandler)
+
+    def lookup(self, task_id: str) -> str:
+        if (payload := self.cache.get(task_id)) is not None:
+            self.hits += 1
+            return payload
+        with self._read_lock:
+            if (payload := self.cache.get(task_id)) is not None:
+                self.hits += 1
+                return payload  # Read by another client meanwhile
+            meta = self.backend.read_database(task_id)
+            self.reads += 1
+        payload = self.backend.encode_meta(meta)
+        self.cache.put(task_id, payload, ready=meta["status"] in states.READY_STATES)
+        return payload
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self.cache), "hits": self.hits, "reads": self.reads}
+
+    def server_close(self) -> None:
+        super().server_close()
+        Path(cast(str, self.server_address)).unlink(missing_ok=True)
+
+
+class ResultClient:
+    """Connection of a process to the result daemon, one socket per thread. All calls give up quietly."""
+
+    def __init__(self, path: Path | str) -> None:
+        self.path = str(path)
+        self._local = threading.local()
+        self._retry_at = 0.0
+
+    def _connect(self) -> tuple[socket.socket, Any] | None:
+        connection: tuple[socket.socket, Any] | None = getattr(self._local, "connection", None)
+        if connection is not None and getattr(self._local, "pid", None) == os.getpid():
+            return connection
+        if time.monotonic() < self._retry_at:
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(SOCKET_TIMEOUT)
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            self._retry_at = time.monotonic() + RECONNECT_INTERVAL
+            return None
+        self._local.connection = (sock, sock.makefile("rb"))
+        self._local.pid = os.getpid()
+        return self._local.connection
+
+    def _disconnect(self) -> None:
+        connection: tuple[socket.socket, Any] | None = getattr(self._local, "connection", None)
+        if connection is not None and getattr(self._local, "pid", None) == os.getpid():
+            connection[0].close()
+        self._local.connection = None
+        self._retry_at = time.monotonic() + RECONNECT_INTERVAL
+
+    def _send(self, request: dict[str, Any], *, reply: bool) -> dict[str, Any] | None:
+        if (connection := self._connect()) is None:
+            return None
+        sock, responses = connection
+        try:
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            if not reply:
+                return None
+            line = responses.readline()
+            if not line:
+                msg = "The result daemon closed the connection"
+                raise ConnectionError(msg)
+            return json.loads(line)
+        except (OSError, ValueError) as error:
+            logger.warning(f"Result daemon at {self.path} is unavailable: {error}")
+            self._disconnect()
+            return None
+
+    def get(self, task_id: str) -> str | None:
+        """The encoded result, or None when the daemon is not reachable."""
+        response = self._send({"op": "get", "task_id": task_id}, reply=True)
+        return None if response is None else response["payload"]
+
+    def put(self, task_id: str, payload: str) -> None:
+        self._send({"op": "put", "task_id": task_id, "payload": payload}, reply=False)
+
+    def forget(self, task_id: str) -> None:
+        self._send({"op": "forget", "task_id": task_id}, reply=False)
+
+    def stats(self) -> dict[str, int] | None:
+        return self._send({"op": "stats"}, reply=True)
+
+
+class FanInDatabaseBackend(DatabaseBackend):
+    """`DatabaseBackend` pushing finished results to the local result daemon and reading through it."""
+
+    app: Celery
+    url: str
+    serializer: str
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        if self.serializer != "json":
+            msg = f"FanInDatabaseBackend needs the json result serializer, not {self.serializer!r}"
+            raise ImproperlyConfigured(msg)
+        conf = self.app.conf
+        self.socket_path = Path(conf.get("result_fanin_socket", DEFAULT_SOCKET))
+        self.client = ResultClient(self.socket_path)
+        self._stored = threading.local()  # The row written by the current `_store_result` call
+
+    def encode_meta(self, meta: dict[str, Any]) -> str:
+        """Encode task meta-data as returned by `get_task_meta`, for the daemon."""
+        return cast(str, self.encode(dict(meta, result=self.encode_result(meta["result"], meta["status"]))))
+
+    def read_database(self, task_id: str) -> dict[str, Any]:
+        """Task meta-data from the database, bypassing the daemon."""
+        return super()._get_task_meta_for(task_id)  # pyright: ignore[reportAttributeAccessIssue, reportUnknownMemberType, reportUnknownVariableType]
+
+    def _update_result(
+        self,
+        task: Any,  # noqa: ANN401
+        result: object,
+        state: str,
+        traceback: str | None = None,
+        request: Context | None = None,
+    ) -> None:
+        super()._update_result(task, result, state, traceback=traceback, request=request)  # pyright: ignore[reportAttributeAccessIssue, reportUnknownMemberType]
+        # Exactly what is committed, decoded the way `_get_task_meta_for` reads it back
+        data: dict[str, Any] = task.to_dict()
+        for field in ("args", "kwargs"):
+            if data.get(field) is not None:
+                data[field] = self.decode(data[field])
+        session = object_session(task)
+        if session is not None and data["date_done"] is not None:
+            # Round-trip through the column type, e.g. SQLite drops the time zone
+            dialect = session.get_bind().dialect
+            column_type = self.task_cls.__table__.c.date_done.type.dialect_impl(dialect)
+            bind, load = column_type.bind_processor(dialect), column_type.result_processor(dialect, None)
+            value = bind(data["date_done"]) if bind else data["date_done"]
+            data["date_done"] = load(value) if load else value
+        self._stored.data = data
+
+    def _store_result(self, task_id: str, result: object, state: str, *args: Any, **kwargs: Any) -> None:
+        self._stored.data = None
+        super()._store_result(task_id, result, state, *args, **kwargs)  # pyright: ignore[reportAttributeAccessIssue, reportUnknownMemberType]
+        if state in states.READY_STATES and self._stored.data is not None:
+            # The result is already encoded for storage, so the meta-data only needs to be serialized
+            self.client.put(task_id, cast(str, self.encode(self._stored.data)))
+
+    def _get_task_meta_for(self, task_id: str) -> dict[str, Any]:
+        payload = self.client.get(task_id)
+        if payload is None:
+            return self.read_database(task_id)
+        return cast(dict[str, Any], self.decode_result(payload.encode()))
+
+    def _forget(self, task_id: str) -> None:
+        super()._forget(task_id)  # pyright: ignore[reportAttributeAccessIssue, reportUnknownMemberType]
+        self.client.forget(task_id)
+
+
+def serve(app: Celery, path: Path | str | None = None) -> None:
+    """Run the result daemon for the backend of `app` until interrupted."""
+    backend = app.backend
+    if not isinstance(backend, FanInDatabaseBackend):
+        msg = f"The result daemon needs FanInDatabaseBackend, {app.main} uses {type(backend).__name__}"
+        raise ImproperlyConfigured(msg)
+    conf = app.conf
+    cache = ResultCache(
+        max_entries=int(conf.get("result_fanin_max_entries", DEFAULT_MAX_ENTRIES)),
+        pending_ttl=float(conf.get("result_fanin_pending_ttl", DEFAULT_PENDING_TTL)),
+    )
+    with ResultServer(backend, path or backend.socket_path, cache) as server:
+        logger.info(f"Serving results of {backend.url} on {server.server_address}")
+        server.serve_forever()
@@ -1,17 +1,20 @@
+import functools
 import logging
 import multiprocessing
 from typing import Any
 
-from celery import Celery, signals
+from celery import Celery, Task, signals
 
 from celery_workshop.config import basic_celery_config
 from celery_workshop.logging import configure_root_logger
+from celery_workshop.ratelimit import SharedRateLimiter
 
 # Create Celery app
 app = Celery(
     "celery_workshop",
     broker="sqlalchemy+sqlite:///./data/broker.sqlite",
     backend="db+sqlite:///./data/backend.sqlite",
+    task_cls="celery_workshop.deadlines:DeadlineTask",  # Enforces `expires` as a deadline, see deadlines.py
 )
 
 # Configure for testing
@@ -22,6 +25,7 @@ app.conf.update(basic_celery_config)
 app.autodiscover_tasks([
     "celery_workshop.chapter1",
     "celery_workshop.chapter1_exercises",
+    "celery_workshop.mapreduce",
 ])
 
 
@@ -64,3 +68,21 @@ def setup_worker_child_process_name(**_kwargs: dict[str, Any]) -> None:
     if "PoolWorker-" in current_process.name:
         worker_num = current_process.name.split("-")[-1]
         current_process.name = f"WORKER-CHILD{worker_num}"
+
+
+@functools.cache
+def get_rate_limiter() -> SharedRateLimiter:
+    return SharedRateLimiter.from_config(app.conf)
+
+
+@signals.before_task_publish.connect()
+def throttle_task_publish(sender: str | None = None, routing_key: str | None = None, **_kwargs: Any) -> None:
+    """Admission control: hold back publishing until the shared bucket of the queue has a token."""
+    get_rate_limiter().throttle("publish", routing_key, sender)
+
+
+@signals.task_prerun.connect()
+def throttle_task_consume(sender: "Task[Any, Any]", **_kwargs: Any) -> None:
+    """Hold back execution until the shared bucket of the queue has a token."""
+    delivery_info = sender.request.delivery_info or {}
+    get_rate_limiter().throttle("consume", delivery_info.get("routing_key"), sender.name)
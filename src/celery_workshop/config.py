@@ -1,5 +1,7 @@
+from typing import Any
+
 # https://docs.celeryq.dev/en/latest/userguide/configuration.html
-basic_celery_config = {
+basic_celery_config: dict[str, Any] = {
     "task_always_eager": False,  # If True, tasks will be executed locally by blocking until the task returns
     "task_eager_propagates": True,  # If True, exceptions raised by tasks will propagate to the caller
     "task_store_eager_result": True,  # If True, results of eager tasks will be stored
@@ -13,4 +15,20 @@ basic_celery_config = {
     "worker_hijack_root_logger": False,  # Crucial: don't let Celery hijack logging
     "worker_log_format": "%(asctime)s - %(name)s - %(levelname)s - [%(processName)s] %(message)s",
     "worker_task_log_format": "%(asctime)s - %(name)s - %(levelname)s - [%(processName)s] %(message)s",
+    # Host-wide token buckets per queue and task name, enforced at publish and at consume time (see ratelimit.py)
+    # Example: {"compute": {"exercise5_cpu_intensive_task": "2/s"}, "io": {"*": "10/s"}}
+    "shared_rate_limits": {},
+    "shared_rate_limits_db": "./data/ratelimit.sqlite",
+    # Expired tasks discarded by all processes of the host, by task name (see deadlines.py)
+    "deadline_discards_db": "./data/deadlines.sqlite",
+    # Write coalescing of the compact SQLite result backend (see backends/compact.py)
+    "compact_result_flush_interval": 0.01,  # Seconds a result waits to be written with others, 0 writes immediately
+    "compact_result_max_batch": 100,  # Pending results that trigger a write right away
+    # Write coalescing of the pooled SQLAlchemy result backend (see backends/database.py)
+    "pooled_result_flush_interval": 0.01,  # Seconds a result waits to be written with others, 0 writes immediately
+    "pooled_result_max_batch": 100,  # Pending results that trigger a write right away
+    # Local result daemon of the fan-in result backend (see backends/fanin.py)
+    "result_fanin_socket": "./data/results.sock",
+    "result_fanin_max_entries": 10_000,  # Finished results kept in memory, least recently used are dropped
+    "result_fanin_pending_ttl": 0.25,  # Seconds the state of an unfinished task is shared between clients
 }
@@ -0,0 +1,247 @@
+"""
+End-to-end deadlines for tasks, chains and groups.
+
+`with_deadline` turns a relative timeout into an absolute deadline and sets it as the `expires`
+option of a signature and of every task it contains, so the deadline travels with the messages of
+chain links, group members and chord bodies. Work past its deadline is dropped at three points:
+
+- `DeadlineTask.apply_async` does not publish a task whose deadline has passed. This also cancels
+  the remaining links of a chain, since the worker publishes the next link through it.
+- `deadline_strategy` discards expired messages on the worker before the task request is built,
+  using the `expires` message header. The body is only decoded for a discarded message, to find
+  the remaining links of its chain.
+- Celery itself revokes expired tasks that were prefetched before their deadline passed.
+
+In all cases the task is marked as revoked, so `.get()` raises `TaskRevokedError` instead of
+waiting for its timeout, and `task_revoked` is sent with `expired=True`. The chain links that would
+have followed it are marked as revoked too, so a chain result does not stay pending.
+
+Every process counts these discards per task name in a SQLite file shared by the host
+(`deadline_discards_db`), since the next link of a chain is published from the pool child that ran
+the previous one. Read the counts of all processes with:
+
+    get_discard_counts(app.conf).counts()
+"""
+
+import functools
+import logging
+from collections.abc import Callable, Mapping
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, cast
+
+from celery import Task, signals
+from celery.app.task import Context
+from celery.backends.base import BaseBackend
+from celery.canvas import Signature, maybe_signature
+from celery.utils import uuid
+from celery.utils.time import maybe_iso8601
+from celery.worker.control import inspect_command
+from celery.worker.strategy import default as default_strategy
+
+from celery_workshop.sqlite import SQLiteStore
+
+if TYPE_CHECKING:
+    from celery.result import AsyncResult
+
+    _TaskBase = Task[Any, Any]
+else:
+    _TaskBase = Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = Path("./data/deadlines.sqlite")
+
+
+class DiscardCounts(SQLiteStore):
+    """Expired tasks dropped by all processes of the host, by task name."""
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS expired_discards (
+        task_name TEXT PRIMARY KEY,
+        count INTEGER NOT NULL
+    );
+    """
+
+    def add(self, task_name: str, count: int = 1) -> None:
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO expired_discards (task_name, count) VALUES (?, ?)"
+                " ON CONFLICT (task_name) DO UPDATE SET count = count + excluded.count",
+                (task_name, count),
+            )
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._connect().execute("SELECT task_name, count FROM expired_discards").fetchall())
+
+
+@functools.cache
+def _discard_counts(path: Path) -> DiscardCounts:
+    return DiscardCounts(path)
+
+
+def get_discard_counts(conf: Mapping[str, Any]) -> DiscardCounts:
+    """The discard counts of the app with configuration `conf`, one store per file and process."""
+    return _discard_counts(Path(conf.get("deadline_discards_db") or DEFAULT_DB_PATH))
+
+
+def deadline_after(timeout: float) -> datetime:
+    """The absolute deadline `timeout` seconds from now."""
+    return datetime.now(UTC) + timedelta(seconds=timeout)
+
+
+def expires_at(expires: object) -> datetime | None:
+    """The absolute time an `expires` option or header stands for. Relative expiry is counted from now."""
+    if isinstance(expires, int | float):
+        return deadline_after(expires)
+    if isinstance(expires, str):
+        expires = maybe_iso8601(expires)
+    if isinstance(expires, datetime):
+        return expires if expires.tzinfo is not None else expires.replace(tzinfo=UTC)
+    return None
+
+
+def is_expired(expires: object) -> bool:
+    deadline = expires_at(expires)
+    return deadline is not None and deadline <= datetime.now(UTC)
+
+
+def with_deadline(signature: Signature[Any], deadline: float | datetime) -> Signature[Any]:
+    """
+    Set a deadline on a signature and on every task it contains, in place (like `Signature.set`).
+
+    `deadline` is either a timeout in seconds from now or an absolute datetime.
+    Example: with_deadline(chain(add.s(1, 2), double.s()), 10).apply_async()
+    """
+    _set_expires(signature, deadline if isinstance(deadline, datetime) else deadline_after(deadline))
+    return signature
+
+
+def _set_expires(signature: Signature[Any], expires: datetime) -> None:
+    signature.set(expires=expires)
+    # Chains and groups hold their tasks in `tasks`, chords their header group in `tasks` and callback in `body`
+    tasks: Any = getattr(signature, "tasks", ())
+    if isinstance(tasks, Signature):
+        _set_expires(cast("Signature[Any]", tasks), expires)
+    else:
+        for index, task in enumerate(tasks):
+            task_signature = cast("Signature[Any]", maybe_signature(task))
+            if task_signature is not task and isinstance(tasks, list):
+                tasks[index] = task_signature  # Keep the converted signature, so the option is not lost
+            _set_expires(task_signature, expires)
+    body: Any = getattr(signature, "body", None)
+    if body is not None:
+        _set_expires(cast("Signature[Any]", maybe_signature(body)), expires)
+
+
+def discard_expired(task: "Task[Any, Any]", task_id: str, request: Context) -> None:
+    """Mark an expired task as revoked without running it, and count it."""
+    logger.info(f"Discarding expired task {task.name}[{task_id}]")
+    task.backend.mark_as_revoked(task_id, "expired", request=request, store_result=not task.ignore_result)
+    signals.task_revoked.send(sender=task, request=request, terminated=False, signum=None, expired=True)
+
+
+@signals.task_revoked.connect()
+def revoke_expired_chain(
+    sender: "Task[Any, Any] | None" = None,
+    request: Context | None = None,
+    expired: bool = False,  # noqa: FBT001, FBT002
+    **_kwargs: Any,
+) -> None:
+    """Mark the chain links that would have followed an expired task as revoked, like `mark_as_failure` does."""
+    if not expired or sender is None or request is None:
+        return
+    for link in cast("list[dict[str, Any]]", request.chain or []):
+        options: dict[str, Any] = link.get("options", {})
+        link_id = options.get("task_id")
+        if link_id is None:
+            continue  # A nested workflow without a task id of its own
+        # The request the link would have had, as `BaseBackend.mark_as_failure` rebuilds it
+        link_request = Context({**link, **options, "id": link_id, "group": options.get("group_id")})
+        link_task = sender.app.tasks.get(link.get("task", ""))
+        store_result = link_task is None or not link_task.ignore_result
+        sender.backend.mark_as_revoked(link_id, "expired", request=link_request, store_result=store_result)
+
+
+@signals.task_revoked.connect()
+def count_expired_task(sender: "Task[Any, Any] | None" = None, expired: bool = False, **_kwargs: Any) -> None:  # noqa: FBT001, FBT002
+    if expired and sender is not None:
+        get_discard_counts(sender.app.conf).add(sender.name)
+
+
+@inspect_command()
+def expired(state: Any) -> dict[str, dict[str, int]]:  # noqa: ANN401
+    """Expired tasks discarded on the host of this worker, by task name."""
+    return {"discarded": get_discard_counts(state.consumer.app.conf).counts()}
+
+
+def deadline_strategy(task: "Task[Any, Any]", app: object, consumer: Any, **kwargs: Any) -> Callable[..., Any]:  # noqa: ANN401
+    """Celery's default strategy, discarding expired messages before their body is deserialized."""
+    handle_message = default_strategy(task, app, consumer, **kwargs)
+    # Chord membership is in the body. Backends that count chord parts need it, so leave grouped tasks to Celery.
+    counts_chord_parts = type(task.backend).on_chord_part_return is not BaseBackend.on_chord_part_return
+
+    def task_message_handler(message: Any, body: Any, ack: Any, reject: Any, callbacks: Any, **options: Any) -> Any:  # noqa: ANN401
+        headers: dict[str, Any] = message.headers or {}
+        expires = headers.get("expires")
+        if expires is not None and "id" in headers and not (counts_chord_parts and headers.get("group")):
+            try:
+                expired = is_expired(expires)
+            except ValueError:
+                expired = False  # Let Celery report the invalid header
+            if expired:
+                request = Context(
+                    id=headers["id"],
+                    task=task.name,
+                    group=headers.get("group"),
+                    parent_id=headers.get("parent_id"),
+                    root_id=headers.get("root_id"),
+                    chain=_chain_of(message),
+                )
+                discard_expired(task, headers["id"], request)
+                ack(logger, consumer.connection_errors)
+                return None
+        return handle_message(message, body, ack, reject, callbacks, **options)
+
+    return task_message_handler
+
+
+def _chain_of(message: Any) -> list[dict[str, Any]] | None:  # noqa: ANN401
+    """The remaining chain links of a task message, which are only in its body."""
+    try:
+        _args, _kwargs, embed = message.payload
+    except (TypeError, ValueError):
+        return None  # Not a protocol 2 message
+    return cast(dict[str, Any], embed).get("chain") if isinstance(embed, dict) else None
+
+
+class DeadlineTask(_TaskBase):
+    """Task base class enforcing the `expires` option as a deadline at publish and receive time."""
+
+    Strategy = "celery_workshop.deadlines:deadline_strategy"
+
+    def apply_async(  # pyright: ignore[reportIncompatibleMethodOverride]
+        self,
+        args: tuple[Any, ...] | None = None,
+        kwargs: dict[str, Any] | None = None,
+        task_id: str | None = None,
+        producer: Any = None,  # noqa: ANN401
+        link: Any = None,  # noqa: ANN401
+        link_error: Any = None,  # noqa: ANN401
+        shadow: str | None = None,
+        **options: Any,
+    ) -> "AsyncResult[Any]":
+        if is_expired(options.get("expires")):
+            # Nobody waits for the result anymore, so do not spend a message (or a worker) on it
+            task_id = task_id or uuid()
+            request = Context(
+                id=task_id,
+                task=self.name,
+                group=options.get("group_id"),
+                chord=options.get("chord"),
+                chain=options.get("chain"),
+            )
+            discard_expired(self, task_id, request)
+            return self.AsyncResult(task_id)
+        return super().apply_async(args, kwargs, task_id, producer, link, link_error, shadow, **options)
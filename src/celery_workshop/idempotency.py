@@ -0,0 +1,161 @@
+"""
+Idempotent task submission.
+
+Retries and double-clicks upstream tend to enqueue the same task call many times.
+`apply_async_idempotent` derives an idempotency key for a call (or takes an explicit one),
+records it in a small SQLite index and returns the existing AsyncResult for duplicates
+instead of publishing the message again.
+"""
+
+import functools
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, cast
+
+from celery import states
+from celery.utils import uuid
+
+from celery_workshop.sqlite import SQLiteStore, immediate_transaction
+
+if TYPE_CHECKING:
+    from celery import Task
+    from celery.result import AsyncResult
+
+DEFAULT_INDEX_PATH = Path("./data/idempotency.sqlite")
+DEFAULT_TTL = 3600  # Used when results never expire
+
+
+@dataclass
+class IdempotencyStats:
+    """Hit/miss counters of an idempotency index (per process)."""
+
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class IdempotencyIndex(SQLiteStore):
+    """Maps idempotency keys to the task id that owns them, each key living for a TTL."""
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key TEXT PRIMARY KEY,
+        task_id TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires_at ON idempotency_keys (expires_at);
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_INDEX_PATH) -> None:
+        super().__init__(path)
+        self.stats = IdempotencyStats()
+
+    def reserve(self, key: str, task_id: str, ttl: float) -> str | None:
+        """Claim `key` for `task_id`. Returns the id of the task already owning the key, or None if claimed."""
+        with self._lock:
+            now = time.time()
+            with immediate_transaction(self._connect()) as connection:
+                connection.execute("DELETE FROM idempotency_keys WHERE key = ? AND expires_at <= ?", (key, now))
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO idempotency_keys (key, task_id, expires_at) VALUES (?, ?, ?)",
+                    (key, task_id, now + ttl),
+                )
+                if cursor.rowcount == 1:
+                    return None
+                row = connection.execute("SELECT task_id FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+                return row[0]
+
+    def replace(self, key: str, old_task_id: str, new_task_id: str, ttl: float) -> bool:
+        """Hand `key` over from `old_task_id` to `new_task_id`. Returns False if someone else did so first."""
+        with self._lock:
+            cursor = self._connect().execute(
+                "UPDATE idempotency_keys SET task_id = ?, expires_at = ? WHERE key = ? AND task_id = ?",
+                (new_task_id, time.time() + ttl, key, old_task_id),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, key: str, task_id: str) -> None:
+        """Drop `key` if it is still owned by `task_id`."""
+        with self._lock:
+            self._connect().execute("DELETE FROM idempotency_keys WHERE key = ? AND task_id = ?", (key, task_id))
+
+    def lookup(self, key: str) -> str | None:
+        """Get the task id owning a live `key`."""
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT task_id FROM idempotency_keys WHERE key = ? AND expires_at > ?", (key, time.time()))
+                .fetchone()
+            )
+            return row[0] if row else None
+
+    def purge_expired(self) -> int:
+        """Delete all expired keys. Returns the number of deleted keys."""
+        with self._lock:
+            cursor = self._connect().execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (time.time(),))
+            return cursor.rowcount
+
+
+@functools.cache
+def get_default_index() -> IdempotencyIndex:
+    return IdempotencyIndex()
+
+
+def idempotency_key(task: "Task[Any, Any]", args: tuple[Any, ...], kwargs: dict[str, Any]) -> str:
+    """Derive a key from the task name and a hash of its arguments."""
+    payload = json.dumps([list(args), kwargs], sort_keys=True, separators=(",", ":"), default=str)
+    return f"{task.name}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def apply_async_idempotent(
+    task: "Task[Any, Any]",
+    args: tuple[Any, ...] | None = None,
+    kwargs: dict[str, Any] | None = None,
+    *,
+    key: str | None = None,
+    ttl: float | timedelta | None = None,
+    index: IdempotencyIndex | None = None,
+    **options: Any,
+) -> "AsyncResult[Any]":
+    """
+    Like `task.apply_async(args, kwargs, **options)`, but publishes at most once per idempotency key.
+
+    A duplicate submission returns the AsyncResult of the in-flight or completed task owning the key.
+    Only failed or revoked tasks give up their key, so that a retry by the caller runs the task again.
+    The key lives for `ttl` seconds (defaults to `result_expires`, after which the result is gone anyway).
+    """
+    index = index or get_default_index()
+    args = args or ()
+    kwargs = kwargs or {}
+    key = key or idempotency_key(task, args, kwargs)
+    if ttl is None:
+        ttl = cast(float | timedelta | None, task.app.conf.result_expires) or DEFAULT_TTL
+    ttl_seconds = ttl.total_seconds() if isinstance(ttl, timedelta) else float(ttl)
+
+    task_id: str = options.pop("task_id", None) or uuid()
+    existing_id = index.reserve(key, task_id, ttl_seconds)
+    if existing_id is not None:
+        existing: AsyncResult[Any] = task.AsyncResult(existing_id)
+        if existing.state not in states.PROPAGATE_STATES:
+            index.stats.hits += 1
+            return existing
+
+        # The previous attempt failed; take over its key unless a concurrent caller beat us to it
+        if not index.replace(key, existing_id, task_id, ttl_seconds):
+            index.stats.hits += 1
+            return task.AsyncResult(index.lookup(key) or existing_id)
+
+    index.stats.misses += 1
+    try:
+        return task.apply_async(args, kwargs, task_id=task_id, **options)
+    except Exception:
+        index.release(key, task_id)
+        raise
@@ -0,0 +1,378 @@
+"""
+Load generation for the chapter 1 tasks.
+
+Drives a weighted mix of tasks either open-loop (a target rate of submissions per second,
+independent of how fast results come back) or closed-loop (a fixed number of virtual users
+that each wait for their result before submitting the next task). Both ramp up linearly,
+run for a fixed duration and report throughput, latency percentiles and error/timeout counts.
+
+Latency is measured from submission until the worker stored the result (the result's
+`date_done`), so it does not depend on how quickly the generator polls for results.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field
+from datetime import UTC
+from typing import TYPE_CHECKING, Any
+
+from celery import current_app
+
+from celery_workshop.chapter1 import (
+    exercise1_add_numbers,
+    exercise3_multiply_numbers,
+    exercise4_add_ten,
+    exercise4_double_number,
+    exercise5_cpu_intensive_task,
+    exercise5_io_task,
+    exercise5_quick_task,
+)
+
+if TYPE_CHECKING:
+    from celery import Task
+    from celery.result import AsyncResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = "celery"
+POLL_INTERVAL = 0.05  # seconds between result polls
+MAX_SUBMIT_BACKOFF = 5.0  # seconds a closed-loop user waits at most after failed submissions
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of latencies, with a bounded relative error and constant memory per magnitude.
+
+    Values are recorded in microseconds. Each power of two is split into 2**(significant_bits - 1)
+    linear sub-buckets, so every recorded value is off by less than 2**-(significant_bits - 1).
+    """
+
+    def __init__(self, significant_bits: int = 11) -> None:
+        self.significant_bits = significant_bits
+        self.counts: dict[int, int] = {}
+        self.total = 0
+        self.sum_us = 0
+        self.min_us: int | None = None
+        self.max_us: int | None = None
+
+    def _index(self, value_us: int) -> int:
+        shift = max(0, value_us.bit_length() - self.significant_bits)
+        return (shift << self.significant_bits) | (value_us >> shift)
+
+    def _highest_equivalent_value(self, index: int) -> int:
+        shift = index >> self.significant_bits
+        sub_bucket = index & ((1 << self.significant_bits) - 1)
+        return (sub_bucket << shift) + (1 << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        value_us = max(0, round(seconds * 1_000_000))
+        index = self._index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum_us += value_us
+        self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+        self.max_us = value_us if self.max_us is None else max(self.max_us, value_us)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum_us += other.sum_us
+        for value_us in (other.min_us, other.max_us):
+            if value_us is not None:
+                self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+                self.max_us = value_us if self.max_us is None else max(self.max_us, value_us)
+
+    def percentile(self, percentile: float) -> float:
+        """Latency in seconds at or below which `percentile` percent of the recorded values are."""
+        if not self.total:
+            return 0.0
+        threshold = max(1, round(self.total * percentile / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= threshold:
+                return min(self._highest_equivalent_value(index), self.max_us or 0) / 1_000_000
+        return (self.max_us or 0) / 1_000_000
+
+    @property
+    def mean(self) -> float:
+        return self.sum_us / self.total / 1_000_000 if self.total else 0.0
+
+
+@dataclass(frozen=True)
+class WorkloadTask:
+    """A task of the mix, how to generate its arguments and the queue it is routed to by default."""
+
+    task: "Task[..., Any]"
+    make_args: Callable[[random.Random], tuple[Any, ...]]
+    queue: str = DEFAULT_QUEUE
+
+
+WORKLOAD_TASKS: dict[str, WorkloadTask] = {
+    "add": WorkloadTask(exercise1_add_numbers, lambda rng: (rng.randint(0, 100), rng.randint(0, 100))),
+    "multiply": WorkloadTask(exercise3_multiply_numbers, lambda rng: (rng.randint(0, 100), rng.randint(0, 100))),
+    "double": WorkloadTask(exercise4_double_number, lambda rng: (rng.randint(0, 100),)),
+    "add_ten": WorkloadTask(exercise4_add_ten, lambda rng: (rng.randint(0, 100),)),
+    "cpu": WorkloadTask(exercise5_cpu_intensive_task, lambda rng: (rng.randint(0, 100),), queue="compute"),
+    "io": WorkloadTask(exercise5_io_task, lambda rng: (f"file-{rng.randint(0, 999)}.csv",), queue="io"),
+    "quick": WorkloadTask(exercise5_quick_task, lambda rng: (f"message-{rng.randint(0, 999)}",)),
+}
+
+
+def parse_weights(spec: str) -> dict[str, float]:
+    """Parse a task mix like "add=3,quick=1" into weights per task. A missing weight counts as 1."""
+    weights: dict[str, float] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        if name not in WORKLOAD_TASKS:
+            msg = f"Unknown task {name!r}, choose from {', '.join(WORKLOAD_TASKS)}"
+            raise ValueError(msg)
+        weights[name] = float(value or 1)
+    return weights
+
+
+def parse_routes(spec: str) -> dict[str, str]:
+    """Parse "name=queue,name=queue" into queue overrides per task of the mix."""
+    routes: dict[str, str] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, queue = item.partition("=")
+        if name not in WORKLOAD_TASKS or not queue:
+            msg = f"Invalid route {item!r}, expected <task>=<queue> with a task from {', '.join(WORKLOAD_TASKS)}"
+            raise ValueError(msg)
+        routes[name] = queue
+    return routes
+
+
+@dataclass
+class LoadConfig:
+    """What load to generate. Set exactly one of `rate` (open-loop) or `concurrency` (closed-loop)."""
+
+    mix: Mapping[str, float]
+    rate: float | None = None  # Submissions per second
+    concurrency: int | None = None  # Virtual users
+    duration: float = 30.0  # Seconds of measured steady-state load, after the ramp-up
+    ramp_up: float = 0.0  # Seconds to linearly ramp up to the full rate/concurrency, not measured
+    timeout: float = 10.0  # Seconds after which a pending task counts as timed out
+    routes: Mapping[str, str] = field(default_factory=dict[str, str])  # Queue overrides per task of the mix
+    seed: int | None = None
+
+    def __post_init__(self) -> None:
+        if (self.rate is None) == (self.concurrency is None):
+            msg = "Set exactly one of rate (open-loop) or concurrency (closed-loop)"
+            raise ValueError(msg)
+        if not self.mix or any(weight < 0 for weight in self.mix.values()) or not sum(self.mix.values()):
+            msg = "The mix needs at least one task with a positive weight"
+            raise ValueError(msg)
+        if self.rate is not None and self.rate <= 0:
+            msg = f"The rate must be positive, got {self.rate}"
+            raise ValueError(msg)
+        if self.concurrency is not None and self.concurrency < 1:
+            msg = f"The concurrency must be at least 1, got {self.concurrency}"
+            raise ValueError(msg)
+        if self.duration <= 0:
+            msg = f"The duration must be positive, got {self.duration}"
+            raise ValueError(msg)
+        if self.ramp_up < 0 or self.timeout < 0:
+            msg = f"The ramp-up and timeout must not be negative, got {self.ramp_up} and {self.timeout}"
+            raise ValueError(msg)
+
+
+@dataclass
+class TaskStats:
+    """Outcomes of the tasks of a single kind. Only tasks submitted after the ramp-up are counted."""
+
+    sent: int = 0
+    completed: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+
+@dataclass
+class LoadReport:
+    """Results of a load run."""
+
+    duration: float
+    per_task: dict[str, TaskStats]
+
+    @property
+    def total(self) -> TaskStats:
+        total = TaskStats()
+        for stats in self.per_task.values():
+            total.sent += stats.sent
+            total.completed += stats.completed
+            total.errors += stats.errors
+            total.timeouts += stats.timeouts
+            total.latency.merge(stats.latency)
+        return total
+
+    @property
+    def throughput(self) -> float:
+        """Completed tasks per second during the measured window."""
+        return self.total.completed / self.duration if self.duration else 0.0
+
+    def format(self) -> str:
+        lines = [
+            f"{'task':<10} {'sent':>7} {'ok':>7} {'errors':>7} {'timeouts':>8} "
+            f"{'p50':>8} {'p90':>8} {'p99':>8} {'p99.9':>8} {'max':>8}"
+        ]
+        for name, stats in [*sorted(self.per_task.items()), ("total", self.total)]:
+            latency = stats.latency
+            percentiles = " ".join(f"{latency.percentile(p) * 1000:>6.0f}ms" for p in (50, 90, 99, 99.9, 100))
+            lines.append(
+                f"{name:<10} {stats.sent:>7} {stats.completed:>7} {stats.errors:>7} {stats.timeouts:>8} {percentiles}"
+            )
+        lines.append(f"throughput: {self.throughput:.2f} tasks/s over {self.duration:.1f}s")
+        return "\n".join(lines)
+
+
+@dataclass
+class _Pending:
+    name: str
+    result: "AsyncResult[Any]"
+    sent_at: float  # Wall-clock time, comparable to the result's date_done
+    measured: bool
+
+
+class LoadGenerator:
+    """Generates load according to a `LoadConfig` and collects the outcomes into a `LoadReport`."""
+
+    def __init__(self, config: LoadConfig) -> None:
+        self.config = config
+        self._rng = random.Random(config.seed)  # noqa: S311 (not used for security)
+        self._rng_lock = threading.Lock()
+        self._names = list(config.mix)
+        self._weights = [config.mix[name] for name in self._names]
+        # The current app is thread-local, so resolve the tasks here rather than in the client threads
+        self._tasks = {name: current_app.tasks[WORKLOAD_TASKS[name].task.name] for name in self._names}
+        self._stats = {name: TaskStats() for name in self._names}
+        self._stats_lock = threading.Lock()
+        self._pending: list[_Pending] = []
+        self._pending_lock = threading.Lock()
+        self._started = 0.0
+
+    def run(self) -> LoadReport:
+        self._started = time.monotonic()
+        if self.config.rate is not None:
+            self._run_open_loop(self.config.rate)
+        else:
+            self._run_closed_loop(self.config.concurrency or 1)
+        return LoadReport(duration=self.config.duration, per_task=self._stats)
+
+    @property
+    def _elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    @property
+    def _ramp_fraction(self) -> float:
+        ramp_up = self.config.ramp_up
+        return min(1.0, self._elapsed / ramp_up) if ramp_up > 0 else 1.0
+
+    def _submit(self) -> _Pending | None:
+        with self._rng_lock:
+            name = self._rng.choices(self._names, self._weights)[0]
+            workload = WORKLOAD_TASKS[name]
+            args = workload.make_args(self._rng)
+
+        measured = self._elapsed >= self.config.ramp_up
+        queue = self.config.routes.get(name, workload.queue)
+        sent_at = time.time()
+        try:
+            result = self._tasks[name].apply_async(args, queue=queue)
+        except Exception:
+            logger.exception(f"Failed to submit {name}")
+            if measured:
+                with self._stats_lock:
+                    self._stats[name].sent += 1
+                    self._stats[name].errors += 1
+            return None
+
+        if measured:
+            with self._stats_lock:
+                self._stats[name].sent += 1
+        return _Pending(name, result, sent_at, measured)
+
+    def _finish(self, pending: _Pending) -> bool:
+        """Record the outcome of a task if it is done or timed out. Returns whether it is."""
+        result = pending.result
+        timed_out = time.time() - pending.sent_at > self.config.timeout
+        if not timed_out and not result.ready():
+            return False
+
+        if pending.measured:
+            with self._stats_lock:
+                stats = self._stats[pending.name]
+                if timed_out and not result.ready():
+                    stats.timeouts += 1
+                elif result.successful():
+                    stats.completed += 1
+                    date_done = result.date_done
+                    if date_done is not None and date_done.tzinfo is None:
+                        date_done = date_done.replace(tzinfo=UTC)  # Backends like db+sqlite drop the UTC zone
+                    done_at = date_done.timestamp() if date_done is not None else time.time()
+                    stats.latency.record(done_at - pending.sent_at)
+                else:
+                    stats.errors += 1
+        result.forget()
+        return True
+
+    def _collect(self, stop: threading.Event) -> None:
+        """Poll all pending results until `stop` is set and nothing is pending anymore."""
+        while not stop.is_set() or self._pending:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+            unfinished = [item for item in pending if not self._finish(item)]
+            with self._pending_lock:
+                self._pending.extend(unfinished)
+            time.sleep(POLL_INTERVAL)
+
+    def _run_open_loop(self, rate: float) -> None:
+        stop = threading.Event()
+        collector = threading.Thread(target=self._collect, args=(stop,), name="loadgen-collector", daemon=True)
+        collector.start()
+
+        end = self.config.ramp_up + self.config.duration
+        next_send = self._elapsed
+        while next_send < end:
+            if (delay := next_send - self._elapsed) > 0:
+                time.sleep(delay)
+            pending = self._submit()
+            if pending is not None:
+                with self._pending_lock:
+                    self._pending.append(pending)
+            # Schedule from the planned send time, so slow submissions do not lower the rate (open loop)
+            next_send += 1 / max(rate * self._ramp_fraction, rate / 100)
+
+        stop.set()
+        collector.join()
+
+    def _run_closed_loop(self, concurrency: int) -> None:
+        end = self.config.ramp_up + self.config.duration
+
+        def user(index: int) -> None:
+            # Users join one by one over the ramp-up
+            time.sleep(self.config.ramp_up * index / concurrency)
+            backoff = POLL_INTERVAL
+            while self._elapsed < end:
+                pending = self._submit()
+                if pending is None:
+                    # Do not hammer an unavailable broker: wait longer after every failure in a row
+                    time.sleep(min(backoff, max(0.0, end - self._elapsed)))
+                    backoff = min(backoff * 2, MAX_SUBMIT_BACKOFF)
+                    continue
+                backoff = POLL_INTERVAL
+                while not self._finish(pending):
+                    time.sleep(POLL_INTERVAL)
+
+        users = [
+            threading.Thread(target=user, args=(index,), name=f"loadgen-user-{index}", daemon=True)
+            for index in range(concurrency)
+        ]
+        for thread in users:
+            thread.start()
+        for thread in users:
+            thread.join()
@@ -0,0 +1,131 @@
+"""
+Map-reduce over a task without a chord round-trip.
+
+`run_task_group` style code sends every member result back to the client, which then assembles
+and aggregates the list. `map_reduce` instead splits the inputs into chunks and sends one
+`map_reduce_chunk` task per chunk. It runs the mapped task in-process for every item of its
+chunk and folds the results into a partial aggregate, so only one (already reduced) result per
+chunk is stored. The client merges the partial aggregates.
+
+Chunks are routed to the queue of the mapped task, and every item is admitted by the shared rate
+limits of the mapped task (see ratelimit.py). A chunk whose deadline passes stops before its next
+item and is marked as revoked (see deadlines.py).
+"""
+
+import math
+import operator
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, cast
+
+from celery import current_app, group, shared_task
+from celery.exceptions import Ignore
+
+from celery_workshop.deadlines import discard_expired, is_expired
+
+if TYPE_CHECKING:
+    from celery import Task
+
+DEFAULT_CHUNK_SIZE = 10  # Largest chunk chosen by default
+MIN_CHUNKS = 8  # Inputs are split into at least this many chunks by default, so small inputs run in parallel
+
+
+@dataclass(frozen=True)
+class Reducer:
+    """An aggregation that can be computed incrementally and combined across chunks."""
+
+    initial: Callable[[], Any]  # Aggregate of no values
+    step: Callable[[Any, Any], Any]  # Fold a single value into an aggregate
+    merge: Callable[[Any, Any], Any]  # Combine two partial aggregates
+
+
+def _min(a: Any, b: Any) -> Any:  # noqa: ANN401
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _max(a: Any, b: Any) -> Any:  # noqa: ANN401
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _histogram_step(histogram: dict[str, int], value: object) -> dict[str, int]:
+    # Keys are strings, so partial histograms survive JSON serialization unchanged
+    key = str(value)
+    histogram[key] = histogram.get(key, 0) + 1
+    return histogram
+
+
+def _histogram_merge(histogram: dict[str, int], other: dict[str, int]) -> dict[str, int]:
+    for key, count in other.items():
+        histogram[key] = histogram.get(key, 0) + count
+    return histogram
+
+
+# Reducers are referenced by name, since they have to travel to the workers in the task message
+REDUCERS: dict[str, Reducer] = {
+    "sum": Reducer(int, operator.add, operator.add),
+    "count": Reducer(int, lambda count, _: count + 1, operator.add),
+    "min": Reducer(lambda: None, _min, _min),
+    "max": Reducer(lambda: None, _max, _max),
+    "histogram": Reducer(dict, _histogram_step, _histogram_merge),
+}
+
+
+@shared_task(name="map_reduce_chunk", bind=True)
+def map_reduce_chunk(self: "Task[..., Any]", task_name: str, chunk: list[list[Any]], reducer: str) -> Any:  # noqa: ANN401
+    """Run `task_name` for every argument list in `chunk` and reduce the results to a partial aggregate."""
+    from celery_workshop.celery import get_rate_limiter
+
+    task = current_app.tasks[task_name]
+    reduce = REDUCERS[reducer]
+    queue = (self.request.delivery_info or {}).get("routing_key")
+
+    aggregate = reduce.initial()
+    for args in chunk:
+        if is_expired(self.request.expires):
+            discard_expired(self, cast(str, self.request.id), self.request)
+            raise Ignore
+        get_rate_limiter().throttle("consume", queue, task.name)
+        # Calling the task object runs it in this worker process, without a round-trip through the broker
+        aggregate = reduce.step(aggregate, task(*args))
+    return aggregate
+
+
+def map_reduce(
+    task: "Task[..., Any]",
+    iterable: Iterable[Any],
+    reducer: str,
+    chunk_size: int | None = None,
+    timeout: float | None = 10,
+    **options: Any,
+) -> Any:  # noqa: ANN401
+    """
+    Apply `task` to every item of `iterable` on the workers and aggregate the results with a named reducer.
+
+    Items that are tuples are passed as positional arguments, anything else as the single argument.
+    Chunks are processed in parallel, the items within a chunk sequentially. Larger chunks store and
+    send fewer results, smaller chunks spread the work over more worker processes. By default inputs
+    are split into at least MIN_CHUNKS chunks of at most DEFAULT_CHUNK_SIZE items.
+
+    `options` are passed to `apply_async` of the chunks (e.g. `expires`). Without a `queue`, the chunks
+    go to the queue `task` is routed to.
+
+    Example: map_reduce(exercise4_double_number, [1, 2, 3], "sum") == 12
+    """
+    reduce = REDUCERS[reducer]
+    items: list[list[Any]] = [
+        list(cast(tuple[Any, ...], item)) if isinstance(item, tuple) else [item] for item in iterable
+    ]
+    if chunk_size is None:
+        chunk_size = max(1, min(DEFAULT_CHUNK_SIZE, math.ceil(len(items) / MIN_CHUNKS)))
+    chunks = [items[offset : offset + chunk_size] for offset in range(0, len(items), chunk_size)]
+    if not chunks:
+        return reduce.initial()
+
+    if "queue" not in options:
+        options["queue"] = task.app.amqp.router.route({}, task.name)["queue"].name
+    result = group(map_reduce_chunk.s(task.name, chunk, reducer) for chunk in chunks).apply_async(**options)
+
+    aggregate = reduce.initial()
+    for partial in result.get(timeout=timeout):
+        aggregate = reduce.merge(aggregate, partial)
+    return aggregate
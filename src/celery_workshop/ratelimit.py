@@ -0,0 +1,104 @@
+"""
+Host-wide token buckets shared by all producer and worker processes.
+
+Celery's `rate_limit` task option is enforced per worker, so three workers sharing a host
+each get the full rate. The buckets here live in a local SQLite file and are updated in a
+single write transaction, which makes the limit apply to the aggregate of all processes.
+
+Limits are configured in `basic_celery_config["shared_rate_limits"]`, keyed by queue and then
+by task name ("*" matches any task on the queue and shares one bucket between them):
+
+    "shared_rate_limits": {"compute": {"exercise5_cpu_intensive_task": "2/s"}}
+"""
+
+import logging
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+
+from celery.utils.time import rate
+
+from celery_workshop.sqlite import SQLiteStore, immediate_transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = Path("./data/ratelimit.sqlite")
+ANY_TASK = "*"
+MIN_LOGGED_WAIT = 0.001  # seconds
+
+
+class SharedRateLimiter(SQLiteStore):
+    """Token buckets keyed by stage ("publish" or "consume"), queue and task name."""
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS token_buckets (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_DB_PATH, limits: Mapping[str, Mapping[str, str]] | None = None):
+        super().__init__(path)
+        self.limits = limits or {}
+
+    @classmethod
+    def from_config(cls, conf: Mapping[str, Any]) -> "SharedRateLimiter":
+        return cls(conf.get("shared_rate_limits_db") or DEFAULT_DB_PATH, conf.get("shared_rate_limits"))
+
+    def rule_for(self, queue: str | None, task_name: str | None) -> tuple[str, float] | None:
+        """Find the bucket name and rate (tokens per second) limiting a task on a queue."""
+        queue_limits = self.limits.get(queue or "", {})
+        for name in (task_name or ANY_TASK, ANY_TASK):
+            if name in queue_limits:
+                tokens_per_second = rate(queue_limits[name])
+                # A rate of 0 means no limit, like Celery's own rate_limit
+                return (f"{queue}:{name}", tokens_per_second) if tokens_per_second else None
+        return None
+
+    def try_acquire(self, key: str, tokens_per_second: float, capacity: float, tokens: float = 1.0) -> float:
+        """Take `tokens` from a bucket. Returns 0 on success, otherwise the seconds until enough tokens are left."""
+        with self._lock, immediate_transaction(self._connect()) as connection:
+            now = time.time()
+            row = connection.execute("SELECT tokens, updated_at FROM token_buckets WHERE key = ?", (key,)).fetchone()
+            available = capacity if row is None else min(capacity, row[0] + (now - row[1]) * tokens_per_second)
+
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / tokens_per_second
+
+            connection.execute(
+                "INSERT OR REPLACE INTO token_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, available, now),
+            )
+            return wait
+
+    def acquire(self, key: str, tokens_per_second: float, capacity: float, timeout: float | None = None) -> bool:
+        """Block until a token is taken from a bucket. Returns False if that did not happen within `timeout`."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while wait := self.try_acquire(key, tokens_per_second, capacity):
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+        return True
+
+    def throttle(self, stage: str, queue: str | None, task_name: str | None) -> float:
+        """Wait for admission of a task at the given stage. Returns the seconds spent waiting."""
+        rule = self.rule_for(queue, task_name)
+        if rule is None:
+            return 0.0
+
+        bucket, tokens_per_second = rule
+        started = time.monotonic()
+        # Allow bursts of one second worth of tokens, but always at least a single task
+        self.acquire(f"{stage}:{bucket}", tokens_per_second, capacity=max(1.0, tokens_per_second))
+        waited = time.monotonic() - started
+        if waited >= MIN_LOGGED_WAIT:
+            logger.debug(f"Throttled {task_name} on {queue} at {stage} for {waited:.3f}s")
+        return waited
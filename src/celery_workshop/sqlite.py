@@ -0,0 +1,44 @@
+"""Small helpers for the local SQLite files shared between producer and worker processes."""
+
+import contextlib
+import os
+import sqlite3
+import threading
+from collections.abc import Generator
+from pathlib import Path
+from typing import ClassVar
+
+
+@contextlib.contextmanager
+def immediate_transaction(connection: sqlite3.Connection) -> Generator[sqlite3.Connection]:
+    """Run a block in a write transaction, taking the database lock upfront."""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+class SQLiteStore:
+    """Base class for stores keeping their state in a SQLite file, with one connection per process."""
+
+    schema: ClassVar[str] = ""
+
+    def __init__(self, path: Path | str) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections must not be shared with forked children, so reconnect when the pid changes
+        if self._connection is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(self.schema)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
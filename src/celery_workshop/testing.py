@@ -1,7 +1,26 @@
 import contextlib
+import logging
 import multiprocessing
 import time
-from collections.abc import Iterator
+from collections.abc import Generator
+from dataclasses import dataclass
+from queue import Empty
+from typing import Any
+
+from celery import bootsteps, signals
+from celery.worker import state as worker_state
+
+logger = logging.getLogger(__name__)
+
+# Events of the worker running in this process, set by start_worker
+_worker_events: "multiprocessing.Queue[tuple[str, Any]] | None" = None
+
+
+def _in_flight() -> dict[str, list[str]]:
+    return {
+        "active": [request.id for request in worker_state.active_requests],
+        "reserved": [request.id for request in worker_state.reserved_requests],
+    }
 
 
 @contextlib.contextmanager
@@ -14,9 +33,59 @@ def measure_execution_time():
         pass
 
 
-def start_worker(argv: list[str] | None = None, concurrency: int = 1, queues: list[str] | None = None) -> None:
+class DrainReporter(bootsteps.StartStopStep):
+    """Consumer step reporting to the parent process when the worker consumes and when it stops consuming."""
+
+    requires = ("celery.worker.consumer.tasks:Tasks",)
+
+    def __init__(self, parent: object, **kwargs: Any) -> None:
+        super().__init__(parent, **kwargs)
+        self.events = _worker_events
+
+    def start(self, parent: object) -> None:
+        _ = parent  # Unused
+        if self.events is not None:
+            self.events.put(("ready", None))
+
+    def stop(self, parent: object) -> None:
+        _ = parent  # Unused
+        # Runs when the consumer stopped consuming, before the pool waits for the active tasks.
+        # Prefetched tasks that are not active are returned to the broker when the consumer closes its channel.
+        if self.events is not None and worker_state.should_stop is not None:
+            self.events.put(("stopped", _in_flight()))
+
+
+def report_shutting_down(**_kwargs: Any) -> None:
+    """The worker received SIGTERM, it keeps executing until the consumer notices and stops."""
+    if _worker_events is not None:
+        _worker_events.put(("draining", _in_flight()))
+
+
+@dataclass
+class DrainReport:
+    """Outcome of draining a worker."""
+
+    drained: int  # Tasks that were executing when the drain started and finished
+    requeued: int  # Prefetched tasks that were returned to the broker without running
+    interrupted: int  # Tasks that were still executing at the deadline and got killed
+    timed_out: bool  # Whether the worker had to be killed at the deadline
+
+
+def start_worker(
+    argv: list[str] | None = None,
+    concurrency: int = 1,
+    queues: list[str] | None = None,
+    events: "multiprocessing.Queue[tuple[str, Any]] | None" = None,
+) -> None:
+    global _worker_events  # noqa: PLW0603
+
     from celery_workshop.celery import app
 
+    if events is not None:
+        _worker_events = events
+        app.steps["consumer"].add(DrainReporter)
+        signals.worker_shutting_down.connect(report_shutting_down)
+
     # Process naming is now handled automatically by Celery app signals
 
     # Configure worker through app.conf using multiple update calls
@@ -36,6 +105,9 @@ def start_worker(argv: list[str] | None = None, concurrency: int = 1, queues: li
 
     # Minimal worker args - configuration is handled by app.conf
     worker_args = ["--quiet", "worker", "--loglevel=INFO"]
+    if queues:
+        # The queues of the app are cached once it published a task, possibly in the parent before the fork
+        worker_args.append(f"--queues={','.join(queues)}")
 
     # Add any additional arguments
     if argv:
@@ -44,14 +116,102 @@ def start_worker(argv: list[str] | None = None, concurrency: int = 1, queues: li
     app.worker_main(worker_args)
 
 
+class WorkerProcess(multiprocessing.Process):
+    """A worker in a child process that can be drained instead of killed."""
+
+    def __init__(self, argv: list[str] | None = None, concurrency: int = 1, queues: list[str] | None = None) -> None:
+        self.events: multiprocessing.Queue[tuple[str, Any]] = multiprocessing.Queue()
+        self.received: dict[str, Any] = {}
+        self.worker_args = (argv, concurrency, queues)
+        super().__init__(target=start_worker, args=(*self.worker_args, self.events))
+
+    def _wait_for(self, name: str, deadline: float) -> bool:
+        """Receive events until `name` arrives (True), or the deadline passes or the worker exits (False)."""
+        while name not in self.received:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                event, payload = self.events.get(timeout=min(remaining, 0.1))
+            except Empty:
+                if not self.is_alive():
+                    return False
+                continue
+            self.received[event] = payload
+        return True
+
+    def wait_ready(self, timeout: float = 30) -> None:
+        """Block until the worker consumes from its queues."""
+        if not self._wait_for("ready", time.monotonic() + timeout):
+            msg = f"Worker {self.pid} did not start consuming within {timeout}s"
+            raise TimeoutError(msg)
+
+    def drain(self, timeout: float) -> DrainReport:
+        """
+        Warm shutdown: stop consuming, return prefetched messages to the broker and wait up to `timeout`
+        seconds for the active tasks to finish. Kill the worker if it is still running at the deadline.
+        """
+        from celery_workshop.celery import app
+
+        deadline = time.monotonic() + timeout
+        self.terminate()  # SIGTERM is a warm shutdown for Celery workers
+        self._wait_for("stopped", deadline)
+        self.join(timeout=max(0.0, deadline - time.monotonic()))
+        timed_out = self.is_alive()
+        if timed_out:
+            self.kill()
+            self.join(timeout=5)
+        self._wait_for("stopped", time.monotonic() + 0.1)  # Events flushed while exiting
+
+        # Tasks are accepted until the consumer stops, so combine what was active at SIGTERM and at the stop.
+        # The reserved tasks are only known at SIGTERM, the consumer forgets them before it stops.
+        draining: dict[str, list[str]] = self.received.get("draining") or {"active": [], "reserved": []}
+        stopped: dict[str, list[str]] = self.received.get("stopped") or {"active": [], "reserved": []}
+        active = {*draining["active"], *stopped["active"]}
+        ready = {task_id for task_id in active if app.AsyncResult(task_id).ready()}
+        report = DrainReport(
+            drained=len(active & ready),
+            requeued=len(set(draining["reserved"]) - active),  # Even if another worker ran it since
+            interrupted=len(active - ready),
+            timed_out=timed_out,
+        )
+        logger.info(f"Drained worker {self.pid}: {report}")
+        return report
+
+
 def start_worker_in_process(
-    argv: list[str] | None = None, concurrency: int = 1, queues: list[str] | None = None
-) -> Iterator[multiprocessing.Process]:
-    worker_process = multiprocessing.Process(target=start_worker, args=(argv, concurrency, queues))
+    argv: list[str] | None = None,
+    concurrency: int = 1,
+    queues: list[str] | None = None,
+    drain_timeout: float | None = None,
+) -> Generator[WorkerProcess]:
+    """Run a worker in a child process. It is killed at the end, or drained if `drain_timeout` is set."""
+    worker_process = WorkerProcess(argv, concurrency, queues)
     worker_process.start()
 
     try:
         yield worker_process
     finally:
-        worker_process.kill()
-        worker_process.join(timeout=5)
+        if drain_timeout is None:
+            worker_process.kill()
+            worker_process.join(timeout=5)
+        else:
+            worker_process.drain(drain_timeout)
+
+
+def rolling_restart(
+    workers: list[WorkerProcess], drain_timeout: float, ready_timeout: float = 30
+) -> tuple[list[WorkerProcess], list[DrainReport]]:
+    """
+    Replace workers one at a time. Each replacement consumes before the worker it replaces is drained,
+    so the capacity never drops below the original number of workers.
+    """
+    replacements: list[WorkerProcess] = []
+    reports: list[DrainReport] = []
+    for worker in workers:
+        replacement = WorkerProcess(*worker.worker_args)
+        replacement.start()
+        replacement.wait_ready(ready_timeout)
+        reports.append(worker.drain(drain_timeout))
+        replacements.append(replacement)
+    return replacements, reports
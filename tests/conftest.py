@@ -1,6 +1,9 @@
 import multiprocessing
+from pathlib import Path
 
 import pytest
+from celery import Celery
+from celery.backends.database import DatabaseBackend
 
 from celery_workshop.logging import configure_root_logger
 
@@ -10,3 +13,16 @@ def setup_logging():
     multiprocessing.current_process().name = "SCHEDULER"
 
     configure_root_logger()
+
+
+@pytest.fixture
+def database_url(tmp_path: Path) -> str:
+    return f"sqlite:///{tmp_path}/backend.sqlite"
+
+
+@pytest.fixture
+def stock_backend(database_url: str) -> DatabaseBackend:
+    """The stock backend on the same database, to see what is stored."""
+    backend = Celery("stock", backend=f"db+{database_url}", set_as_current=False).backend
+    assert isinstance(backend, DatabaseBackend)
+    return backend
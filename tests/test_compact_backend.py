@@ -0,0 +1,127 @@
+import sqlite3
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from celery import Celery, signals, states
+from celery.result import AsyncResult, GroupResult
+
+from celery_workshop.backends.compact import CompactBackend
+
+
+@pytest.fixture
+def compact_app(tmp_path: Path) -> Celery:
+    backend_url = f"celery_workshop.backends.compact:CompactBackend+sqlite:///{tmp_path}/results.sqlite"
+    return Celery("compact", backend=backend_url, set_as_current=False)
+
+
+def stored_statuses(backend: CompactBackend) -> dict[str, str]:
+    """What other processes see, bypassing the pending writes of `backend`."""
+    return {row[0]: row[1] for row in backend.store.query_tasks([], [])}
+
+
+@pytest.fixture
+def backend(compact_app: Celery) -> CompactBackend:
+    assert isinstance(compact_app.backend, CompactBackend)
+    return compact_app.backend
+
+
+@pytest.mark.parametrize("value", [None, True, False, 42, 2**70, 1.5, "text", [1, 2], {"a": [1.0, None]}])
+def test_results_round_trip(backend: CompactBackend, value: object):
+    backend.store_result("task-1", value, states.SUCCESS)
+
+    meta = backend.get_task_meta("task-1", cache=False)
+    assert meta["status"] == states.SUCCESS
+    assert meta["result"] == value
+    assert type(meta["result"]) is type(value)
+    assert meta["date_done"] is not None
+
+
+def test_scalars_are_stored_inline(backend: CompactBackend):
+    backend.store_many([("int", 7, states.SUCCESS), ("str", "seven", states.SUCCESS), ("list", [7], states.SUCCESS)])
+
+    with sqlite3.connect(backend.store.path) as connection:
+        stored = dict(connection.execute("SELECT task_id, typeof(result) FROM task_results").fetchall())
+    assert stored == {"int": "integer", "str": "text", "list": "text"}
+
+
+def test_failures_are_restored_as_exceptions(backend: CompactBackend):
+    backend.mark_as_failure("task-1", ValueError("boom"), traceback="Traceback ...")
+
+    meta = backend.get_task_meta("task-1")
+    assert meta["status"] == states.FAILURE
+    assert isinstance(meta["result"], ValueError)
+    assert meta["traceback"] == "Traceback ..."
+
+
+def test_unknown_task_is_pending(backend: CompactBackend):
+    assert backend.get_task_meta("missing")["status"] == states.PENDING
+
+
+def test_query_by_status_and_date(compact_app: Celery, backend: CompactBackend):
+    backend.store_many([("ok-1", 1, states.SUCCESS), ("ok-2", 2, states.SUCCESS)])
+    backend.mark_as_failure("failed", RuntimeError("boom"))
+    backend.mark_as_started("running")
+
+    failed = backend.query(status=states.FAILURE, since=compact_app.now() - timedelta(hours=1))
+    assert [meta["task_id"] for meta in failed] == ["failed"]
+    assert {meta["task_id"] for meta in backend.query(status=states.READY_STATES)} == {"ok-1", "ok-2", "failed"}
+    assert backend.query(since=compact_app.now() + timedelta(hours=1)) == []
+    assert len(backend.query(limit=2)) == 2
+
+
+def test_group_join_uses_bulk_reads(compact_app: Celery, backend: CompactBackend):
+    ids = [f"task-{i}" for i in range(5)]
+    results: list[AsyncResult[int]] = [AsyncResult(task_id, app=compact_app) for task_id in ids]
+    group_result = GroupResult("group-1", results, app=compact_app)
+    backend.store_many((task_id, i * 2, states.SUCCESS) for i, task_id in enumerate(ids))
+
+    assert group_result.supports_native_join
+    assert group_result.get(timeout=1) == [0, 2, 4, 6, 8]
+
+    backend.save_group("group-1", group_result)
+    restored = backend.restore_group("group-1")
+    assert restored is not None
+    assert restored.results is not None
+    assert [result.id for result in restored.results] == ids
+
+
+def test_cleanup_removes_expired_results(backend: CompactBackend):
+    backend.store_result("task-1", 1, states.SUCCESS)
+    backend.expires = timedelta(seconds=-1)
+    backend.cleanup()
+
+    assert backend.get_task_meta("task-1", cache=False)["status"] == states.PENDING
+
+
+def test_worker_writes_are_coalesced_until_flush(compact_app: Celery, backend: CompactBackend):
+    compact_app.conf.update(compact_result_flush_interval=60)
+    backend = CompactBackend(url=backend.url, app=compact_app)
+    backend.store_result("task-1", None, states.STARTED)
+    backend.store_result("task-1", 1, states.SUCCESS)
+    backend.store_result("task-2", 2, states.SUCCESS)
+    assert stored_statuses(backend) == {}
+
+    assert backend.get_task_meta("task-1", cache=False)["result"] == 1  # Reads flush first
+
+    assert stored_statuses(backend) == {"task-1": states.SUCCESS, "task-2": states.SUCCESS}
+
+
+def test_worker_shutdown_flushes_pending_writes(compact_app: Celery, backend: CompactBackend):
+    compact_app.conf.update(compact_result_flush_interval=60)
+    backend = CompactBackend(url=backend.url, app=compact_app)
+    backend.store_result("task-1", 1, states.SUCCESS)
+
+    signals.worker_process_shutdown.send(sender=None, pid=None, exitcode=0)
+
+    assert stored_statuses(backend) == {"task-1": states.SUCCESS}
+
+
+def test_flush_thread_writes_after_interval(backend: CompactBackend):
+    backend.store_result("task-1", 1, states.SUCCESS)
+
+    deadline = time.monotonic() + 5
+    while not stored_statuses(backend) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stored_statuses(backend) == {"task-1": states.SUCCESS}
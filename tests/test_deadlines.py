@@ -0,0 +1,122 @@
+import multiprocessing
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING, Any, cast
+
+import pytest
+from celery import chain, chord, group, signals, states
+from celery.exceptions import TaskRevokedError
+
+from celery_workshop.celery import app
+from celery_workshop.chapter1 import exercise1_add_numbers, exercise4_double_number, exercise5_cpu_intensive_task
+from celery_workshop.deadlines import get_discard_counts, with_deadline
+from celery_workshop.testing import start_worker_in_process
+
+if TYPE_CHECKING:
+    from celery.result import AsyncResult
+
+
+@pytest.fixture(autouse=True, scope="module")
+def celery_app() -> None:
+    app.set_current()
+
+
+@pytest.fixture(scope="module")
+def solo_worker() -> Iterator[multiprocessing.Process]:
+    for process in start_worker_in_process(concurrency=1):
+        exercise1_add_numbers.delay(1, 2).get(timeout=30)  # Wait for the worker to be ready
+        yield process
+
+
+def discard_count(task_name: str) -> int:
+    return get_discard_counts(app.conf).counts().get(task_name, 0)
+
+
+def test_with_deadline_reaches_nested_tasks():
+    deadline = datetime.now(UTC) + timedelta(seconds=10)
+    workflow = chain(
+        exercise1_add_numbers.s(1, 2),
+        group(exercise4_double_number.s(), exercise4_double_number.s()),
+        chord([exercise1_add_numbers.s(1, 1)], exercise4_double_number.s()),
+    )
+
+    assert with_deadline(workflow, deadline) is workflow
+
+    def all_signatures(signature: Any) -> Iterator[Any]:  # noqa: ANN401
+        yield signature
+        for task in getattr(signature, "tasks", ()):
+            yield from all_signatures(task)
+        if (body := getattr(signature, "body", None)) is not None:
+            yield from all_signatures(body)
+
+    signatures = list(all_signatures(workflow))
+    assert len(signatures) > 5
+    assert all(signature.options["expires"] == deadline for signature in signatures)
+
+
+def test_with_deadline_accepts_timeout():
+    signature = with_deadline(exercise1_add_numbers.s(1, 2), 10)
+
+    remaining = signature.options["expires"] - datetime.now(UTC)
+    assert timedelta(seconds=9) < remaining <= timedelta(seconds=10)
+
+
+def test_expired_task_is_not_published():
+    published: list[str] = []
+
+    def record_publish(sender: str | None = None, **_kwargs: Any) -> None:
+        published.append(str(sender))
+
+    signals.before_task_publish.connect(record_publish)
+    try:
+        before = discard_count(exercise1_add_numbers.name)
+        result = exercise1_add_numbers.apply_async((1, 2), expires=datetime.now(UTC) - timedelta(seconds=1))
+    finally:
+        signals.before_task_publish.disconnect(record_publish)
+
+    assert published == []
+    assert result.state == states.REVOKED
+    with pytest.raises(TaskRevokedError):
+        result.get(timeout=1)
+    assert discard_count(exercise1_add_numbers.name) == before + 1
+
+
+@pytest.mark.usefixtures("solo_worker")
+def test_expired_chain_stops_early():
+    workflow = chain(exercise5_cpu_intensive_task.s(2), *(exercise5_cpu_intensive_task.s() for _ in range(5)))
+    result = with_deadline(workflow, 1.2).apply_async()
+
+    # Each link takes 0.5s, so the deadline passes in the middle of the chain and the remaining links are dropped
+    with pytest.raises(TaskRevokedError):
+        result.get(timeout=10)
+    links = [result]
+    while (parent := links[-1].parent) is not None:
+        links.append(cast("AsyncResult[Any]", parent))
+    assert len(links) == 6
+    assert links[-1].state == states.SUCCESS
+    assert links[0].state == states.REVOKED
+    assert all(link.state in {states.SUCCESS, states.REVOKED} for link in links)
+
+
+@pytest.mark.usefixtures("solo_worker")
+def test_expired_message_is_discarded_by_worker():
+    busy = [exercise5_cpu_intensive_task.delay(number) for number in range(3)]
+    queued = exercise5_cpu_intensive_task.apply_async((9,), expires=0.5)
+
+    # Queued behind 1.5s of work, it expires before the worker gets to it
+    with pytest.raises(TaskRevokedError):
+        queued.get(timeout=10)
+    assert [result.get(timeout=10) for result in busy] == [0, 1, 4]
+
+
+@pytest.mark.usefixtures("solo_worker")
+def test_discards_in_the_worker_are_counted_for_everyone():
+    before = discard_count(exercise5_cpu_intensive_task.name)
+    workflow = chain(exercise5_cpu_intensive_task.s(2), exercise5_cpu_intensive_task.s())
+    result = with_deadline(workflow, 0.2).apply_async()
+
+    # The worker drops the second link when publishing it (or the first one, if it receives it late)
+    with pytest.raises(TaskRevokedError):
+        result.get(timeout=10)
+
+    assert discard_count(exercise5_cpu_intensive_task.name) == before + 1
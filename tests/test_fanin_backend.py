@@ -0,0 +1,126 @@
+import multiprocessing
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from celery import Celery, states
+from celery.backends.database import DatabaseBackend
+
+from celery_workshop.backends.fanin import FanInDatabaseBackend, ResultCache, ResultServer
+
+
+@pytest.fixture
+def backend(database_url: str, tmp_path: Path) -> FanInDatabaseBackend:
+    backend_url = f"celery_workshop.backends.fanin:FanInDatabaseBackend+{database_url}"
+    app = Celery("fanin", backend=backend_url, set_as_current=False)
+    app.conf.update(result_fanin_socket=str(tmp_path / "results.sock"))
+    assert isinstance(app.backend, FanInDatabaseBackend)
+    return app.backend
+
+
+@pytest.fixture
+def server(backend: FanInDatabaseBackend) -> Iterator[ResultServer]:
+    with ResultServer(backend, backend.socket_path, ResultCache(pending_ttl=60)) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+
+
+def test_cache_drops_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", "1", ready=True)
+    cache.put("b", "2", ready=True)
+    assert cache.get("a") == "1"  # Now "b" is the least recently used
+
+    cache.put("c", "3", ready=True)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+
+def test_cache_expires_unfinished_results():
+    cache = ResultCache(pending_ttl=0.05)
+    cache.put("a", "started", ready=False)
+    assert cache.get("a") == "started"
+
+    time.sleep(0.1)
+
+    assert cache.get("a") is None
+
+
+def test_cache_keeps_finished_result_over_older_read():
+    cache = ResultCache()
+    cache.put("a", "done", ready=True)
+
+    cache.put("a", "started", ready=False)
+
+    assert cache.get("a") == "done"
+
+
+def test_reads_database_without_daemon(backend: FanInDatabaseBackend):
+    backend.store_result("task-1", 1, states.SUCCESS)
+
+    assert backend.client.get("task-1") is None
+    assert backend.get_task_meta("task-1", cache=False)["result"] == 1
+
+
+@pytest.mark.parametrize("value", [None, 42, "text", {"a": [1.0, None]}])
+def test_finished_results_are_served_from_memory(
+    backend: FanInDatabaseBackend, stock_backend: DatabaseBackend, server: ResultServer, value: object
+):
+    backend.store_result("task-1", value, states.SUCCESS)
+    stats = backend.client.stats()  # Waits for the pushed result to be received
+
+    assert stats is not None
+    assert stats["entries"] == 1
+    assert backend.get_task_meta("task-1", cache=False) == stock_backend.get_task_meta("task-1", cache=False)
+    assert server.reads == 0
+
+
+def test_failures_are_served_from_memory(backend: FanInDatabaseBackend, server: ResultServer):
+    backend.store_result("task-1", ValueError("boom"), states.FAILURE)
+
+    result = backend.app.AsyncResult("task-1", backend=backend)
+    with pytest.raises(ValueError, match="boom"):
+        result.get(timeout=5, interval=0.01)
+    assert server.reads == 0
+
+
+def test_unfinished_results_are_read_once(backend: FanInDatabaseBackend, server: ResultServer):
+    for _ in range(3):
+        assert backend.get_task_meta("task-1", cache=False)["status"] == states.PENDING
+    assert server.reads == 1
+
+    backend.store_result("task-1", 1, states.SUCCESS)
+
+    assert backend.get_task_meta("task-1", cache=False)["result"] == 1
+    assert server.reads == 1
+
+
+def test_forget_drops_cached_result(backend: FanInDatabaseBackend, server: ResultServer):
+    backend.store_result("task-1", 1, states.SUCCESS)
+
+    backend.forget("task-1")
+
+    assert backend.get_task_meta("task-1", cache=False)["status"] == states.PENDING
+    assert server.reads == 1
+
+
+def _store_in_child(backend: FanInDatabaseBackend) -> None:
+    backend.store_result("child-task", "from child", states.SUCCESS)
+
+
+def test_forked_child_pushes_results(backend: FanInDatabaseBackend, server: ResultServer):
+    assert backend.get_task_meta("parent-task", cache=False)["status"] == states.PENDING  # Connects the parent
+
+    child = multiprocessing.get_context("fork").Process(target=_store_in_child, args=(backend,))
+    child.start()
+    child.join(timeout=10)
+
+    assert child.exitcode == 0
+    assert backend.get_task_meta("child-task", cache=False)["result"] == "from child"
+    assert server.reads == 1
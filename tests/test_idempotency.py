@@ -0,0 +1,70 @@
+import multiprocessing
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from celery_workshop.celery import app
+from celery_workshop.chapter1 import exercise1_add_numbers
+from celery_workshop.idempotency import IdempotencyIndex, apply_async_idempotent, idempotency_key
+from celery_workshop.testing import start_worker_in_process
+
+
+@pytest.fixture(autouse=True, scope="module")
+def celery_app() -> None:
+    app.set_current()
+
+
+@pytest.fixture(scope="module")
+def single_worker() -> Iterator[multiprocessing.Process]:
+    yield from start_worker_in_process(concurrency=1)
+
+
+@pytest.fixture
+def index(tmp_path: Path) -> IdempotencyIndex:
+    return IdempotencyIndex(tmp_path / "idempotency.sqlite")
+
+
+def test_key_depends_on_task_and_arguments():
+    key = idempotency_key(exercise1_add_numbers, (1, 2), {})
+    assert key != idempotency_key(exercise1_add_numbers, (1, 2), {"unused": None})
+    assert key != idempotency_key(exercise1_add_numbers, (2, 1), {})
+    assert key.startswith("exercise1_add_numbers:")
+
+
+def test_reserve_returns_owner_of_live_key(index: IdempotencyIndex):
+    assert index.reserve("key", "task-1", ttl=60) is None
+    assert index.reserve("key", "task-2", ttl=60) == "task-1"
+    assert index.lookup("key") == "task-1"
+
+
+def test_reserve_reclaims_expired_key(index: IdempotencyIndex):
+    assert index.reserve("key", "task-1", ttl=0.01) is None
+    time.sleep(0.02)
+    assert index.reserve("key", "task-2", ttl=60) is None
+    assert index.lookup("key") == "task-2"
+
+
+def test_replace_only_succeeds_for_current_owner(index: IdempotencyIndex):
+    index.reserve("key", "task-1", ttl=60)
+    assert index.replace("key", "task-1", "task-2", ttl=60)
+    assert not index.replace("key", "task-1", "task-3", ttl=60)
+    assert index.lookup("key") == "task-2"
+
+
+@pytest.mark.usefixtures("single_worker")
+def test_duplicate_submission_returns_existing_result(index: IdempotencyIndex):
+    first = apply_async_idempotent(exercise1_add_numbers, (20, 22), index=index)
+    second = apply_async_idempotent(exercise1_add_numbers, (20, 22), index=index)
+    other = apply_async_idempotent(exercise1_add_numbers, (1, 1), index=index)
+
+    assert second.id == first.id
+    assert other.id != first.id
+    assert first.get(timeout=10) == 42
+    assert other.get(timeout=10) == 2
+
+    # Completed results are returned as well
+    assert apply_async_idempotent(exercise1_add_numbers, (20, 22), index=index).get(timeout=10) == 42
+    assert (index.stats.hits, index.stats.misses) == (2, 2)
+    assert index.stats.hit_rate == pytest.approx(0.5)
@@ -0,0 +1,124 @@
+import multiprocessing
+import time
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+
+from celery_workshop.celery import app
+from celery_workshop.chapter1 import exercise1_add_numbers
+from celery_workshop.loadgen import LatencyHistogram, LoadConfig, LoadGenerator, parse_routes, parse_weights
+from celery_workshop.testing import start_worker_in_process
+
+
+@pytest.fixture(autouse=True, scope="module")
+def celery_app() -> None:
+    app.set_current()
+
+
+@pytest.fixture(scope="module")
+def parallel_worker() -> Iterator[multiprocessing.Process]:
+    for process in start_worker_in_process(concurrency=4):
+        # Wait for the worker to be ready, so its startup is not part of the measured load
+        exercise1_add_numbers.delay(1, 2).get(timeout=30)
+        yield process
+
+
+def test_histogram_percentiles_within_relative_error():
+    histogram = LatencyHistogram(significant_bits=8)
+    for millis in range(1, 1001):
+        histogram.record(millis / 1000)
+
+    assert histogram.total == 1000
+    for percentile, expected in [(50, 0.5), (90, 0.9), (99, 0.99)]:
+        assert histogram.percentile(percentile) == pytest.approx(expected, rel=2**-7)
+    assert histogram.percentile(100) == pytest.approx(1.0)
+    assert histogram.mean == pytest.approx(0.5005)
+    # Memory is bounded by the magnitude of the values, not their number
+    assert len(histogram.counts) < 1000
+
+
+def test_histogram_merge():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    first.record(0.01)
+    second.record(2.0)
+    second.record(0.001)
+
+    first.merge(second)
+
+    assert first.total == 3
+    assert first.percentile(0) == pytest.approx(0.001)
+    assert first.percentile(100) == pytest.approx(2.0)
+
+
+def test_parse_mix_and_routes():
+    assert parse_weights("add=3, quick") == {"add": 3.0, "quick": 1.0}
+    assert parse_routes("cpu=celery") == {"cpu": "celery"}
+    with pytest.raises(ValueError, match="Unknown task"):
+        parse_weights("unknown=1")
+    with pytest.raises(ValueError, match="exactly one"):
+        LoadConfig(mix={"add": 1}, rate=10, concurrency=2)
+    with pytest.raises(ValueError, match="rate must be positive"):
+        LoadConfig(mix={"add": 1}, rate=0)
+    with pytest.raises(ValueError, match="rate must be positive"):
+        LoadConfig(mix={"add": 1}, rate=-5)
+    with pytest.raises(ValueError, match="concurrency must be at least 1"):
+        LoadConfig(mix={"add": 1}, concurrency=0)
+    with pytest.raises(ValueError, match="duration must be positive"):
+        LoadConfig(mix={"add": 1}, rate=10, duration=0)
+    with pytest.raises(ValueError, match="must not be negative"):
+        LoadConfig(mix={"add": 1}, rate=10, ramp_up=-1)
+    with pytest.raises(ValueError, match="must not be negative"):
+        LoadConfig(mix={"add": 1}, rate=10, timeout=-1)
+
+
+@pytest.mark.usefixtures("parallel_worker")
+def test_closed_loop_run_reports_completed_tasks():
+    config = LoadConfig(mix={"add": 1, "double": 1}, concurrency=2, duration=1, ramp_up=0.2, seed=1)
+
+    report = LoadGenerator(config).run()
+
+    total = report.total
+    assert total.completed > 0
+    assert total.errors == total.timeouts == 0
+    assert total.completed == total.sent
+    assert total.latency.total == total.completed
+    assert report.throughput > 0
+
+
+@pytest.mark.usefixtures("parallel_worker")
+def test_open_loop_run_sends_at_target_rate():
+    config = LoadConfig(mix={"add": 1}, rate=20, duration=1, seed=1)
+
+    report = LoadGenerator(config).run()
+
+    assert report.total.sent == pytest.approx(20, abs=2)
+    assert report.total.completed == report.total.sent
+
+
+@pytest.mark.usefixtures("parallel_worker")
+def test_latency_is_independent_of_local_time_zone(monkeypatch: pytest.MonkeyPatch):
+    # The db+sqlite backend returns date_done without time zone, it must not be read as local time
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        report = LoadGenerator(LoadConfig(mix={"add": 1}, concurrency=1, duration=1, seed=1)).run()
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+    assert report.total.completed > 0
+    assert 0 < report.total.latency.percentile(100) < 10
+
+
+def test_closed_loop_backs_off_when_submitting_fails(monkeypatch: pytest.MonkeyPatch):
+    def unavailable(*_args: Any, **_kwargs: Any) -> None:
+        msg = "Broker unavailable"
+        raise ConnectionError(msg)
+
+    monkeypatch.setattr(app.tasks[exercise1_add_numbers.name], "apply_async", unavailable)
+    report = LoadGenerator(LoadConfig(mix={"add": 1}, concurrency=1, duration=1, seed=1)).run()
+
+    # Waits of 0.05, 0.1, 0.2, 0.4, ... seconds: a handful of attempts rather than a busy loop
+    assert 0 < report.total.errors <= 6
+    assert report.total.errors == report.total.sent
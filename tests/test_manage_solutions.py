@@ -0,0 +1,99 @@
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from scripts import manage_solutions
+from scripts.manage_solutions import process_files, strip_solution_blocks
+
+EXERCISE = """\
+def add(x, y):
+    # START SOLUTION
+    return x + y
+    # END SOLUTION
+"""
+STUDENT_VERSION = """\
+def add(x, y):
+    # TODO: Implement this function
+    pass
+"""
+
+
+def strip(source: str) -> tuple[str, int]:
+    output = io.StringIO(newline="")
+    blocks = strip_solution_blocks(io.StringIO(source, newline=""), output.write)
+    return output.getvalue(), blocks
+
+
+@pytest.fixture
+def workspace(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(manage_solutions, "get_workspace_root", lambda: tmp_path)
+    monkeypatch.setattr(manage_solutions, "EXERCISE_FILES", ["exercises/*.py", "missing/*.py"])
+    (tmp_path / "exercises").mkdir()
+    (tmp_path / "exercises" / "chapter1.py").write_text(EXERCISE, encoding="utf-8")
+    return tmp_path
+
+
+def run(action: str, capsys: pytest.CaptureFixture[str]) -> str:
+    process_files(action, jobs=1)
+    return capsys.readouterr().out
+
+
+def test_strip_replaces_blocks():
+    assert strip(EXERCISE) == (STUDENT_VERSION, 1)
+
+
+def test_strip_keeps_unterminated_block():
+    source = "def add(x, y):\n    # START SOLUTION\n    return x + y\n"
+
+    assert strip(source) == (source, 0)
+
+
+def test_strip_keeps_crlf_line_endings():
+    assert strip(EXERCISE.replace("\n", "\r\n")) == (STUDENT_VERSION.replace("\n", "\r\n"), 1)
+
+
+def test_strip_end_on_last_line_without_newline():
+    assert strip(EXERCISE.removesuffix("\n")) == (STUDENT_VERSION.removesuffix("\n"), 1)
+
+
+def test_remove_twice_skips_unchanged_file(workspace: Path, capsys: pytest.CaptureFixture[str]):
+    assert "Removed 1 solution(s) from chapter1.py" in run("remove", capsys)
+    assert "chapter1.py: unchanged, skipped" in run("remove", capsys)
+    assert (workspace / "exercises" / "chapter1.py").read_text(encoding="utf-8") == STUDENT_VERSION
+
+
+def test_restore_twice_skips_restored_file(workspace: Path, capsys: pytest.CaptureFixture[str]):
+    run("remove", capsys)
+
+    assert "Restored chapter1.py from backup" in run("restore", capsys)
+    assert "chapter1.py: already restored, skipped" in run("restore", capsys)
+    assert (workspace / "exercises" / "chapter1.py").read_text(encoding="utf-8") == EXERCISE
+
+
+def test_editing_a_file_invalidates_its_manifest_entry(workspace: Path, capsys: pytest.CaptureFixture[str]):
+    exercise = workspace / "exercises" / "chapter1.py"
+    run("remove", capsys)
+
+    exercise.write_text(STUDENT_VERSION + "\n\n" + EXERCISE.replace("add", "sub"), encoding="utf-8")
+
+    assert "Removed 1 solution(s) from chapter1.py" in run("remove", capsys)
+    assert "START SOLUTION" not in exercise.read_text(encoding="utf-8")
+
+
+def test_check_json_reports_every_file(
+    workspace: Path, capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch
+):
+    (workspace / "exercises" / "chapter2.py").write_bytes(b"# \xff not UTF-8\n")
+    monkeypatch.setattr(sys, "argv", ["manage_solutions.py", "check", "--json", "--jobs", "1"])
+
+    manage_solutions.main()
+
+    captured = capsys.readouterr()
+    summary = json.loads(captured.out)
+    assert summary["total_solutions"] == 1
+    assert summary["files"][0] == {"file": "exercises/chapter1.py", "solutions": 1, "backup": False}
+    assert summary["files"][1]["file"] == "exercises/chapter2.py"
+    assert "can't decode" in summary["files"][1]["error"]
+    assert "Skipping missing/*.py (not found)" in captured.err
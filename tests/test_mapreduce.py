@@ -0,0 +1,94 @@
+import contextlib
+import multiprocessing
+from collections.abc import Generator, Iterator
+from typing import Any
+
+import pytest
+from celery import signals
+from celery.exceptions import TaskRevokedError
+
+from celery_workshop.celery import app
+from celery_workshop.chapter1 import exercise3_multiply_numbers, exercise4_double_number
+from celery_workshop.mapreduce import REDUCERS, map_reduce
+from celery_workshop.testing import start_worker_in_process
+
+
+@contextlib.contextmanager
+def recorded_routing_keys() -> Generator[list[str]]:
+    """Routing keys of the tasks published in the block."""
+    routing_keys: list[str] = []
+
+    def record_publish(routing_key: str | None = None, **_kwargs: Any) -> None:
+        routing_keys.append(str(routing_key))
+
+    signals.before_task_publish.connect(record_publish)
+    try:
+        yield routing_keys
+    finally:
+        signals.before_task_publish.disconnect(record_publish)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def celery_app() -> None:
+    app.set_current()
+
+
+@pytest.fixture(scope="module")
+def parallel_worker() -> Iterator[multiprocessing.Process]:
+    yield from start_worker_in_process(concurrency=4, queues=["celery", "mapped"])
+
+
+@pytest.mark.parametrize(
+    ("reducer", "expected"),
+    [("sum", 9), ("count", 4), ("min", 1), ("max", 4), ("histogram", {"1": 1, "2": 2, "4": 1})],
+)
+def test_partial_aggregates_merge_to_full_aggregate(reducer: str, expected: object):
+    reduce = REDUCERS[reducer]
+    partials: list[Any] = []
+    for chunk in ([1, 2], [2, 4], []):
+        partial = reduce.initial()
+        for value in chunk:
+            partial = reduce.step(partial, value)
+        partials.append(partial)
+
+    aggregate = reduce.initial()
+    for partial in partials:
+        aggregate = reduce.merge(aggregate, partial)
+    assert aggregate == expected
+
+
+def test_empty_input_returns_initial_aggregate():
+    assert map_reduce(exercise4_double_number, [], "sum") == 0
+
+
+@pytest.mark.usefixtures("parallel_worker")
+def test_map_reduce_sum_of_doubled_numbers():
+    assert map_reduce(exercise4_double_number, range(1, 11), "sum", chunk_size=3) == 110
+
+
+@pytest.mark.usefixtures("parallel_worker")
+def test_map_reduce_histogram_with_tuple_arguments():
+    pairs = [(1, 2), (2, 1), (3, 3), (1, 1)]
+    assert map_reduce(exercise3_multiply_numbers, pairs, "histogram", chunk_size=2) == {"2": 2, "9": 1, "1": 1}
+
+
+@pytest.mark.usefixtures("parallel_worker")
+def test_small_inputs_are_split_for_parallelism():
+    with recorded_routing_keys() as routing_keys:
+        assert map_reduce(exercise4_double_number, [1, 2, 3, 4], "sum") == 20
+
+    # One chunk per item, on the queue of the mapped task
+    assert routing_keys == ["celery"] * 4
+
+
+def test_options_are_forwarded_to_chunks():
+    with pytest.raises(TaskRevokedError):
+        map_reduce(exercise4_double_number, [1, 2], "sum", expires=-1)
+
+
+@pytest.mark.usefixtures("parallel_worker")
+def test_chunks_run_on_given_queue():
+    with recorded_routing_keys() as routing_keys:
+        assert map_reduce(exercise4_double_number, [1, 2], "sum", queue="mapped") == 6
+
+    assert routing_keys == ["mapped"] * 2
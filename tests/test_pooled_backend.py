@@ -0,0 +1,153 @@
+import multiprocessing
+import sqlite3
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from celery import Celery, signals, states
+from celery.backends.database import DatabaseBackend
+from sqlalchemy.exc import OperationalError
+
+from celery_workshop.backends.database import PooledDatabaseBackend
+
+
+def make_backend(database_url: str, flush_interval: float) -> PooledDatabaseBackend:
+    backend_url = f"celery_workshop.backends.database:PooledDatabaseBackend+{database_url}"
+    app = Celery("pooled", backend=backend_url, set_as_current=False)
+    app.conf.update(pooled_result_flush_interval=flush_interval)
+    assert isinstance(app.backend, PooledDatabaseBackend)
+    return app.backend
+
+
+@pytest.mark.parametrize("value", [None, 42, "text", {"a": [1.0, None]}])
+def test_results_round_trip(database_url: str, stock_backend: DatabaseBackend, value: object):
+    backend = make_backend(database_url, flush_interval=0)
+    backend.store_result("task-1", value, states.SUCCESS)
+
+    for reader in (backend, stock_backend):
+        meta = reader.get_task_meta("task-1", cache=False)
+        assert meta["status"] == states.SUCCESS
+        assert meta["result"] == value
+
+
+def test_writes_are_coalesced_until_flush(database_url: str, stock_backend: DatabaseBackend):
+    backend = make_backend(database_url, flush_interval=60)
+    backend.store_result("task-1", None, states.STARTED)
+    backend.store_result("task-1", 1, states.SUCCESS)
+    backend.store_result("task-2", 2, states.SUCCESS)
+
+    assert stock_backend.get_task_meta("task-1", cache=False)["status"] == states.PENDING
+
+    backend.flush()
+
+    assert stock_backend.get_task_meta("task-1", cache=False)["result"] == 1
+    assert stock_backend.get_task_meta("task-2", cache=False)["result"] == 2
+
+
+def test_reads_in_the_same_process_see_pending_writes(database_url: str):
+    backend = make_backend(database_url, flush_interval=60)
+    backend.store_result("task-1", 1, states.SUCCESS)
+
+    assert backend.get_task_meta("task-1", cache=False)["result"] == 1
+
+
+def test_forget_drops_pending_write(database_url: str, stock_backend: DatabaseBackend):
+    backend = make_backend(database_url, flush_interval=60)
+    backend.store_result("task-1", 1, states.SUCCESS)
+
+    backend.forget("task-1")
+    backend.flush()
+
+    assert stock_backend.get_task_meta("task-1", cache=False)["status"] == states.PENDING
+
+
+def test_flush_thread_writes_after_interval(database_url: str, stock_backend: DatabaseBackend):
+    backend = make_backend(database_url, flush_interval=0.01)
+    result = backend.app.AsyncResult("task-1", backend=stock_backend)
+    backend.store_result("task-1", 1, states.SUCCESS)
+
+    assert result.get(timeout=5, interval=0.01) == 1
+
+
+def test_worker_shutdown_flushes_every_backend(database_url: str, stock_backend: DatabaseBackend):
+    backends = [make_backend(database_url, flush_interval=60) for _ in range(2)]
+    for number, backend in enumerate(backends):
+        backend.store_result(f"task-{number}", number, states.SUCCESS)
+
+    signals.worker_process_shutdown.send(sender=None, pid=None, exitcode=0)
+
+    assert [stock_backend.get_task_meta(f"task-{number}", cache=False)["result"] for number in range(2)] == [0, 1]
+
+
+def fail_writes(backend: PooledDatabaseBackend, count: int, before_failing: Callable[[], None] = lambda: None) -> None:
+    """Make the next `count` writes of `backend` fail like a locked SQLite database."""
+    build_upsert = backend._build_upsert  # pyright: ignore[reportPrivateUsage]
+    failures = [count]
+
+    def build_failing_upsert(engine: Any) -> Callable[[Any, list[dict[str, Any]]], None]:  # noqa: ANN401
+        upsert = build_upsert(engine)
+
+        def failing_upsert(connection: Any, rows: list[dict[str, Any]]) -> None:  # noqa: ANN401
+            if failures[0] > 0:
+                failures[0] -= 1
+                before_failing()
+                raise OperationalError("UPDATE", {}, sqlite3.OperationalError("database is locked"))
+            upsert(connection, rows)
+
+        return failing_upsert
+
+    backend._build_upsert = build_failing_upsert  # pyright: ignore[reportPrivateUsage]
+
+
+def test_failed_write_is_retried(database_url: str, stock_backend: DatabaseBackend):
+    backend = make_backend(database_url, flush_interval=60)
+    fail_writes(backend, count=2)
+    backend.store_result("task-1", 1, states.SUCCESS)
+
+    backend.flush()
+
+    assert stock_backend.get_task_meta("task-1", cache=False)["result"] == 1
+
+
+def test_failed_flush_keeps_results_without_overwriting_newer_states(database_url: str, stock_backend: DatabaseBackend):
+    backend = make_backend(database_url, flush_interval=60)
+    # Every attempt fails, and the task finishes while the first one is being written
+    fail_writes(backend, count=3, before_failing=lambda: backend.store_result("task-1", 1, states.SUCCESS))
+    backend.store_result("task-1", None, states.STARTED)
+    backend.store_result("task-2", 2, states.SUCCESS)
+
+    with pytest.raises(OperationalError):
+        backend.flush()
+    backend.flush()
+
+    assert stock_backend.get_task_meta("task-1", cache=False)["result"] == 1
+    assert stock_backend.get_task_meta("task-2", cache=False)["result"] == 2
+
+
+def test_flush_thread_survives_failed_writes(database_url: str, stock_backend: DatabaseBackend):
+    backend = make_backend(database_url, flush_interval=0.01)
+    fail_writes(backend, count=6)  # Two failed flushes
+    backend.store_result("task-1", 1, states.SUCCESS)
+
+    assert backend.app.AsyncResult("task-1", backend=stock_backend).get(timeout=5, interval=0.01) == 1
+    backend.store_result("task-2", 2, states.SUCCESS)
+    assert backend.app.AsyncResult("task-2", backend=stock_backend).get(timeout=5, interval=0.01) == 2
+
+
+def _store_in_child(backend: PooledDatabaseBackend) -> None:
+    backend.store_result("child-task", "from child", states.SUCCESS)
+    backend.flush()
+
+
+def test_forked_child_uses_its_own_engine(database_url: str, stock_backend: DatabaseBackend):
+    backend = make_backend(database_url, flush_interval=60)
+    backend.store_result("parent-task", "from parent", states.SUCCESS)  # Creates the engine of the parent
+
+    child = multiprocessing.get_context("fork").Process(target=_store_in_child, args=(backend,))
+    child.start()
+    child.join(timeout=10)
+
+    assert child.exitcode == 0
+    assert stock_backend.get_task_meta("child-task", cache=False)["result"] == "from child"
+    backend.flush()
+    assert stock_backend.get_task_meta("parent-task", cache=False)["result"] == "from parent"
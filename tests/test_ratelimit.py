@@ -0,0 +1,55 @@
+import multiprocessing
+from pathlib import Path
+
+import pytest
+
+from celery_workshop.ratelimit import SharedRateLimiter
+from celery_workshop.testing import measure_execution_time
+
+
+@pytest.fixture
+def limiter(tmp_path: Path) -> SharedRateLimiter:
+    return SharedRateLimiter(
+        tmp_path / "ratelimit.sqlite",
+        limits={"compute": {"exercise5_cpu_intensive_task": "20/s"}, "io": {"*": "10/s"}},
+    )
+
+
+def test_rule_matches_task_name_then_wildcard(limiter: SharedRateLimiter):
+    assert limiter.rule_for("compute", "exercise5_cpu_intensive_task") == ("compute:exercise5_cpu_intensive_task", 20)
+    assert limiter.rule_for("compute", "exercise5_quick_task") is None
+    assert limiter.rule_for("io", "exercise5_io_task") == ("io:*", 10)
+    assert limiter.rule_for("celery", "exercise5_quick_task") is None
+
+
+def test_bucket_allows_burst_then_asks_to_wait(limiter: SharedRateLimiter):
+    assert limiter.try_acquire("bucket", tokens_per_second=1, capacity=2) == 0
+    assert limiter.try_acquire("bucket", tokens_per_second=1, capacity=2) == 0
+    assert limiter.try_acquire("bucket", tokens_per_second=1, capacity=2) == pytest.approx(1, abs=0.05)
+
+
+def test_acquire_gives_up_after_timeout(limiter: SharedRateLimiter):
+    assert limiter.acquire("bucket", tokens_per_second=0.1, capacity=1)
+    assert not limiter.acquire("bucket", tokens_per_second=0.1, capacity=1, timeout=0.05)
+
+
+def _throttle_compute_tasks(path: Path, count: int) -> None:
+    limiter = SharedRateLimiter(path, limits={"compute": {"*": "20/s"}})
+    for _ in range(count):
+        limiter.throttle("consume", "compute", "exercise5_cpu_intensive_task")
+
+
+def test_bucket_is_shared_across_processes(tmp_path: Path):
+    path = tmp_path / "ratelimit.sqlite"
+    processes = [multiprocessing.Process(target=_throttle_compute_tasks, args=(path, 10)) for _ in range(3)]
+
+    with measure_execution_time() as get_elapsed:
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=10)
+        elapsed_time = get_elapsed()
+
+    # 30 tokens at 20/s with a burst of 20 take at least 0.5s in total, no matter how many processes ask
+    assert all(process.exitcode == 0 for process in processes)
+    assert elapsed_time >= 0.45
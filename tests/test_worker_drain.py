@@ -0,0 +1,88 @@
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from celery import states
+
+from celery_workshop.celery import app
+from celery_workshop.chapter1 import exercise5_cpu_intensive_task
+from celery_workshop.testing import WorkerProcess, rolling_restart, start_worker_in_process
+
+if TYPE_CHECKING:
+    from celery.result import AsyncResult
+
+
+@pytest.fixture(autouse=True, scope="module")
+def celery_app() -> None:
+    app.set_current()
+
+
+def start_ready_worker(concurrency: int = 2) -> WorkerProcess:
+    worker = WorkerProcess(concurrency=concurrency)
+    worker.start()
+    worker.wait_ready()
+    return worker
+
+
+def submit_cpu_tasks(count: int) -> "list[AsyncResult[Any]]":
+    results = [exercise5_cpu_intensive_task.apply_async((number,), queue="celery") for number in range(count)]
+    # Once the first task is done the worker is busy with the following ones
+    results[0].get(timeout=10)
+    return results
+
+
+def test_drain_waits_for_active_tasks():
+    worker = start_ready_worker()
+    submit_cpu_tasks(6)
+
+    report = worker.drain(timeout=15)
+
+    assert not worker.is_alive()
+    assert not report.timed_out
+    assert report.drained >= 1
+    assert report.interrupted == 0
+    assert report.drained + report.requeued <= 6
+
+
+def test_worker_in_process_is_drained_at_the_end():
+    workers = start_worker_in_process(concurrency=2, drain_timeout=15)
+    worker = next(workers)  # Like a fixture: set up until the yield
+    worker.wait_ready()
+    submit_cpu_tasks(6)
+
+    with pytest.raises(StopIteration):
+        next(workers)  # Like the fixture teardown
+
+    # The teardown drained the worker: the tasks it was running finished and their results are stored
+    assert not worker.is_alive()
+    running = {*worker.received["draining"]["active"], *worker.received["stopped"]["active"]}
+    assert running
+    assert all(app.AsyncResult(task_id).state == states.SUCCESS for task_id in running)
+
+
+def test_drain_kills_worker_at_deadline():
+    worker = start_ready_worker()
+    submit_cpu_tasks(3)
+
+    report = worker.drain(timeout=0.2)
+
+    assert report.timed_out
+    assert not worker.is_alive()
+
+
+def test_rolling_restart_does_not_lose_tasks():
+    worker = start_ready_worker()
+    results = submit_cpu_tasks(12)
+
+    [replacement], [report] = rolling_restart([worker], drain_timeout=15)
+    try:
+        assert not worker.is_alive()
+        assert replacement.is_alive()
+        assert not report.timed_out
+        assert [result.get(timeout=30) for result in results] == [number**2 for number in range(12)]
+        # Every task the old worker held either finished there or went back to the broker
+        draining, stopped = worker.received["draining"], worker.received["stopped"]
+        held = {*draining["active"], *stopped["active"], *draining["reserved"]}
+        assert report.interrupted == 0
+        assert report.drained + report.requeued == len(held)
+    finally:
+        replacement.drain(timeout=15)